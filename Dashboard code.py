@@ -1,698 +1,765 @@
-import os
-import json
-import boto3
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import streamlit as st
-from streamlit_autorefresh import st_autorefresh
-import numpy as np
-import math
-
-# ---- CONFIG ----
-BUCKET = os.getenv("SOC2_AUDIT_BUCKET", "soc2-audit-logs-central-206299126127")
-PREFIX = os.getenv("SOC2_AUDIT_PREFIX", "audit_reports/")
-s3 = boto3.client("s3")
-
-st.set_page_config(page_title="SOC2 Compliance Dashboard", layout="wide")
-st_autorefresh(interval=60 * 1000, key="s3_data_refresh")
-
-# ---- CUSTOM CSS ----
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 7rem;
-        font-weight: 900;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-align: center;
-        margin-bottom: 0.5rem;
-        padding: 20px 0;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-    }
-    .sub-header {
-        font-size: 2.8rem;
-        color: #666;
-        text-align: center;
-        margin-bottom: 2rem;
-        font-weight: 300;
-    }
-    .refresh-status {
-        background-color: #e8f4fd;
-        border: 1px solid #bee5eb;
-        border-radius: 8px;
-        padding: 12px;
-        margin: 10px 0;
-        text-align: center;
-        font-weight: 500;
-    }
-    .risk-critical { background-color: #fee2e2 !important; border-left: 4px solid #dc2626 !important; }
-    .risk-high { background-color: #ffedd5 !important; border-left: 4px solid #ea580c !important; }
-    .risk-medium { background-color: #fef3c7 !important; border-left: 4px solid #d97706 !important; }
-    .risk-low { background-color: #f0f9ff !important; border-left: 4px solid #2563eb !important; }
-    .risk-minimal { background-color: #f0fdf4 !important; border-left: 4px solid #16a34a !important; }
-    .log-highlight-critical { border: 2px solid #dc2626 !important; background-color: #fef2f2 !important; }
-    .log-highlight-high { border: 2px solid #ea580c !important; background-color: #fff7ed !important; }
-    .log-highlight-medium { border: 2px solid #d97706 !important; background-color: #fffbeb !important; }
-    .section-header {
-        font-size: 1.8rem;
-        font-weight: 700;
-        color: #2d3748;
-        margin: 2rem 0 1rem 0;
-        padding-bottom: 0.5rem;
-        border-bottom: 3px solid #667eea;
-    }
-    .metric-card {
-        border-radius: 15px;
-        padding: 35px;
-        text-align: center;
-        font-family: 'Arial', sans-serif;
-        transition: all 0.3s ease;
-        color: white;
-        font-weight: bold;
-        cursor: pointer;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        border: none;
-        min-height: 200px;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-    }
-    .metric-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 15px rgba(0, 0, 0, 0.2);
-    }
-    .metric-value {
-        font-size: 4.5rem;
-        font-weight: 900;
-        margin: 25px 0;
-        text-shadow: 2px 2px 5px rgba(0,0,0,0.4);
-        line-height: 1;
-    }
-    .metric-label {
-        font-size: 1.8rem;
-        font-weight: 700;
-        margin-bottom: 15px;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        text-shadow: 1px 1px 3px rgba(0,0,0,0.3);       
-    }
-    .metric-trend {
-        font-size: 16px;
-        font-weight: 600;
-    }
-    .controls-card { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
-    .total-logs-card { background: linear-gradient(135deg, #00cc96 0%, #00a379 100%); }
-    .deviations-card { background: linear-gradient(135deg, #ef553b 0%, #cc4731 100%); }
-    .remediations-card { background: linear-gradient(135deg, #19d3f3 0%, #15b8d9 100%); }
-    .compliance-card { background: linear-gradient(135deg, #ffbb00 0%, #e6a800 100%); }
-    .pagination-btn {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 10px 20px;
-        border-radius: 25px;
-        font-weight: bold;
-        margin: 5px;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    .pagination-btn:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-    }
-    .pagination-btn:disabled {
-        background: #cccccc;
-        cursor: not-allowed;
-        transform: none;
-    }
-    .page-indicator {
-        font-size: 1.2rem;
-        font-weight: bold;
-        color: #667eea;
-        padding: 10px 20px;
-        background: #f0f4ff;
-        border-radius: 20px;
-        margin: 0 10px;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# ---- SIDEBAR ----
-st.sidebar.title("🔧 SOC2 Controls Dashboard")
-st.sidebar.markdown("---")
-use_s3 = st.sidebar.checkbox("Fetch from S3 bucket", value=True)
-manual_refresh = st.sidebar.button("🔄 Refresh Now")
-
-# Pagination controls in sidebar
-st.sidebar.markdown("---")
-st.sidebar.subheader("📊 Trend Chart Controls")
-controls_per_page = st.sidebar.slider("Controls per page", min_value=3, max_value=8, value=4, help="Number of controls to display per page in the trend chart")
-
-st.sidebar.markdown("---")
-st.sidebar.info("**Dashboard Features:**\n- Real-time compliance monitoring\n- Automated risk assessment\n- Detailed log analysis\n- Executive reporting")
-
-# ---- DATA FETCH ----
-def list_logs():
-    try:
-        objects = s3.list_objects_v2(Bucket=BUCKET, Prefix=PREFIX, MaxKeys=1000)
-        if "Contents" not in objects:
-            return []
-        return [obj["Key"] for obj in objects["Contents"] if obj["Key"].endswith(".json")]
-    except Exception as e:
-        st.sidebar.error(f"S3 Error: {e}")
-        return []
-
-def fetch_log(key):
-    obj = s3.get_object(Bucket=BUCKET, Key=key)
-    try:
-        return json.loads(obj["Body"].read().decode("utf-8"))
-    except:
-        return {"raw": obj["Body"].read().decode("utf-8")}
-
-def parse_logs(keys):
-    data = []
-    for k in keys:
-        log = fetch_log(k)
-        control_full = k.split("/")[1] if "/" in k else "unknown"
-        
-        control_family = control_full.split()[0] if " " in control_full else control_full
-        
-        sub_control_type = None
-        if "cc6.7" in control_full.lower() or "cc6-7" in control_full.lower():
-            if "ebs-deleted" in k.lower() or "deleted" in control_full.lower():
-                sub_control_type = "ebs-deleted"
-            elif "ebs-unattached" in k.lower() or "unattached" in control_full.lower():
-                sub_control_type = "ebs-unattached"
-        
-        if isinstance(log, dict):
-            cs = log.get("compliance_status", "").upper()
-            if cs in ["COMPLIANT", "NON_COMPLIANT_REMEDIATED"]:
-                status = "remediation"
-            elif cs == "NON_COMPLIANT":
-                status = "deviation"
-            elif "results" in log:
-                for r in log["results"]:
-                    if r.get("action", "").upper() in ["REVOKED", "REMEDIATED"]:
-                        data.append({
-                            "control": control_family,
-                            "control_full": control_full,
-                            "sub_control_type": sub_control_type,
-                            "status": "remediation",
-                            "log": r,
-                            "raw_log": log,
-                            "s3_key": k,
-                            "timestamp": r.get("timestamp", k)
-                        })
-                continue
-            else:
-                status = "deviation"
-        else:
-            status = (
-                "deviation" if "deviation" in k.lower()
-                else "remediation" if "remediation" in k.lower()
-                else "deviation"
-            )
-
-        data.append({
-            "control": control_family,
-            "control_full": control_full,
-            "sub_control_type": sub_control_type,
-            "status": status,
-            "log": log,
-            "raw_log": log,
-            "s3_key": k,
-            "timestamp": (log.get("timestamp", k) if isinstance(log, dict) else k)
-        })
-    return pd.DataFrame(data)
-
-# ---- MAIN LAYOUT ----
-st.markdown('<h1 class="main-header">📊 SOC2 Compliance Dashboard</h1>', unsafe_allow_html=True)
-st.markdown('<p class="sub-header">Enterprise-Grade Security & Compliance Monitoring Platform</p>', unsafe_allow_html=True)
-
-# Auto-refresh status
-refresh_time = datetime.now() + timedelta(minutes=1)
-st.markdown(f"""
-<div class="refresh-status">
-    🔄 Auto-refresh enabled • Next update: <span style="font-weight:bold;">{refresh_time.strftime('%H:%M:%S')}</span>
-</div>
-""", unsafe_allow_html=True)
-
-if use_s3 or manual_refresh:
-    with st.spinner("🔄 Fetching latest compliance data from S3..."):
-        keys = list_logs()
-        df = parse_logs(keys) if keys else pd.DataFrame()
-else:
-    df = pd.DataFrame()
-
-# ---- ENHANCED METRICS CARDS ----
-total_logs = len(df)
-deviations = len(df[df["status"] == "deviation"]) if not df.empty else 0
-remediations = len(df[df["status"] == "remediation"]) if not df.empty else 0
-compliance_rate = f"{(remediations / (deviations+remediations)*100):.1f}%" if (deviations+remediations) > 0 else "—"
-
-col1, col2, col3, col4, col5 = st.columns(5)
-with col1:
-    st.markdown(f"""
-    <div class='metric-card controls-card'>
-        <span class='metric-label'>Controls Automated</span>
-        <span class='metric-value'>9</span>
-        <div class='metric-trend'>✓ Production Ready</div>
-    </div>
-    """, unsafe_allow_html=True)
-with col2:
-    trend = "📈" if total_logs > 0 else "➡️"
-    st.markdown(f"""
-    <div class='metric-card total-logs-card'>
-        <span class='metric-label'>Total Logs</span>
-        <span class='metric-value'>{total_logs}</span>
-        <div class='metric-trend'>{trend} Real-time</div>
-    </div>
-    """, unsafe_allow_html=True)
-with col3:
-    trend = "⚠️" if deviations > 0 else "✅"
-    st.markdown(f"""
-    <div class='metric-card deviations-card'>
-        <span class='metric-label'>Active Deviations</span>
-        <span class='metric-value'>{deviations}</span>
-        <div class='metric-trend'>{trend} Requires Attention</div>
-    </div>
-    """, unsafe_allow_html=True)
-with col4:
-    trend = "🚀" if remediations > 0 else "➡️"
-    st.markdown(f"""
-    <div class='metric-card remediations-card'>
-        <span class='metric-label'>Remediations</span>
-        <span class='metric-value'>{remediations}</span>
-        <div class='metric-trend'>{trend} Auto-resolved</div>
-    </div>
-    """, unsafe_allow_html=True)
-with col5:
-    status = "✅" if compliance_rate != "—" and float(compliance_rate.rstrip('%')) > 90 else "⚠️"
-    st.markdown(f"""
-    <div class='metric-card compliance-card'>
-        <span class='metric-label'>Compliance Rate</span>
-        <span class='metric-value'>{compliance_rate}</span>
-        <div class='metric-trend'>{status} SOC2 Ready</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-st.markdown("---")
-
-# ---- ENHANCED CHARTS & VISUALIZATIONS ----
-if not df.empty:
-    # Create tabs for better organization
-    tab1, tab2, tab3 = st.tabs(["📊 Compliance Overview",  "📈 Trend Analysis", "🔍 Raw Logs"])
-    
-    with tab1:
-        st.markdown('<div class="section-header">Compliance Overview Dashboard</div>', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            # Enhanced Deviations Pie Chart
-            st.subheader("🔄 Control Deviation Distribution")
-            dev_chart_data = df[df["status"] == "deviation"]["control"].value_counts().reset_index()
-            dev_chart_data.columns = ["Control", "Count"]
-            
-            if not dev_chart_data.empty:
-                # Create custom colors for the pie chart
-                colors = px.colors.sequential.RdBu_r
-                
-                fig_pie = px.pie(
-                    dev_chart_data, 
-                    names="Control", 
-                    values="Count", 
-                    hole=0.4,
-                    color_discrete_sequence=colors
-                )
-                
-                fig_pie.update_traces(
-                    textposition='outside',
-                    textinfo='percent+label',
-                    textfont=dict(
-                        size=18,
-                        color='black',
-                        family="Arial",
-                        weight='bold'
-                    ),
-                    marker=dict(line=dict(color='white', width=2)),
-                    textfont_size=18,
-                    insidetextorientation='horizontal'
-                )
-                
-                fig_pie.update_layout(
-                    width=700,
-                    height=550,
-                    legend=dict(
-                        font=dict(
-                            size=16,
-                            family="Arial",
-                            weight='bold'
-                        ),
-                        orientation="v",
-                        yanchor="top",
-                        y=1,
-                        xanchor="left",
-                        x=1.1
-                    ),
-                    annotations=[dict(
-                        text='Deviations<br>by Control',
-                        x=0.5, y=0.5,
-                        font=dict(
-                            size=20,
-                            color='gray',
-                            weight='bold'
-                        ),
-                        showarrow=False,
-                    )],
-                    font=dict(
-                        family="Arial",
-                        size=16,
-                        color="black"
-                    )
-                )
-                
-                st.plotly_chart(fig_pie, use_container_width=True)
-            else:
-                st.info("🎉 No deviations detected across all controls!")
-        
-        with col2:
-            # Compliance Status Summary
-            st.subheader("📈 Compliance Status")
-            
-            # Create gauge chart for overall compliance
-            overall_rate = float(compliance_rate.rstrip('%')) if compliance_rate != "—" else 0
-            
-            fig_gauge = go.Figure(go.Indicator(
-                mode = "gauge+number+delta",
-                value = overall_rate,
-                domain = {'x': [0, 1], 'y': [0, 1]},
-                title = {'text': "Overall Compliance Rate", 'font': {'size': 16}},
-                delta = {'reference': 90, 'increasing': {'color': "green"}},
-                gauge = {
-                    'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                    'bar': {'color': "darkblue"},
-                    'bgcolor': "white",
-                    'borderwidth': 2,
-                    'bordercolor': "gray",
-                    'steps': [
-                        {'range': [0, 70], 'color': 'red'},
-                        {'range': [70, 90], 'color': 'yellow'},
-                        {'range': [90, 100], 'color': 'green'}],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': 90}}
-            ))
-            
-            fig_gauge.update_layout(height=300, margin=dict(l=20, r=20, t=50, b=20))
-            st.plotly_chart(fig_gauge, use_container_width=True)
-            
-            # Quick Stats
-            st.subheader("📋 Quick Statistics")
-            st.metric("Total Controls Monitored", len(df['control'].unique()))
-            st.metric("Automation Coverage", "100%")
-            st.metric("Data Freshness", "Real-time")
-    
-    with tab2:
-        st.markdown('<div class="section-header">Compliance Trend Analysis</div>', unsafe_allow_html=True)
-        
-        # Generate synthetic time series data for ALL controls
-        all_controls = df['control'].unique()
-        dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
-        
-        # Initialize session state for pagination
-        if 'current_page' not in st.session_state:
-            st.session_state.current_page = 0
-        
-        # Generate realistic trend data for all controls
-        trend_data = []
-        np.random.seed(42)  # For consistent demo data
-        
-        for control in all_controls:
-            base_compliance = np.random.uniform(75, 95)
-            # Create unique trend pattern for each control
-            trend_strength = np.random.uniform(0.001, 0.01)
-            
-            for i, date in enumerate(dates[-30:]):  # Last 30 days
-                # Simulate unique trend for each control
-                trend_factor = 1 + (i * trend_strength)
-                noise = np.random.normal(0, 3)
-                compliance_rate = min(99, max(65, base_compliance * trend_factor + noise))
-                
-                # Simulate findings count inversely related to compliance
-                findings_count = max(0, int(np.random.poisson(8) * (100 - compliance_rate) / 35))
-                
-                trend_data.append({
-                    'Date': date,
-                    'Control': control,
-                    'Compliance_Rate': compliance_rate,
-                    'Findings_Count': findings_count,
-                    'Control_Group': f"Group {(i % 3) + 1}"  # For additional grouping
-                })
-        
-        trend_df = pd.DataFrame(trend_data)
-        
-        if not trend_df.empty:
-            # Calculate pagination
-            total_controls = len(all_controls)
-            total_pages = math.ceil(total_controls / controls_per_page)
-            
-            # Get controls for current page
-            start_idx = st.session_state.current_page * controls_per_page
-            end_idx = min(start_idx + controls_per_page, total_controls)
-            current_controls = all_controls[start_idx:end_idx]
-            
-            # Pagination controls
-            st.subheader(f"📊 Real-time Control Compliance Trends")
-            
-            # Page navigation
-            col_nav1, col_nav2, col_nav3, col_nav4, col_nav5 = st.columns([1, 1, 2, 1, 1])
-            
-            with col_nav1:
-                if st.button("⏮️ First", use_container_width=True):
-                    st.session_state.current_page = 0
-                    st.rerun()
-            
-            with col_nav2:
-                if st.button("⬅️ Previous", use_container_width=True, disabled=st.session_state.current_page == 0):
-                    st.session_state.current_page = max(0, st.session_state.current_page - 1)
-                    st.rerun()
-            
-            with col_nav3:
-                st.markdown(f'<div class="page-indicator">Page {st.session_state.current_page + 1} of {total_pages} | Controls {start_idx + 1}-{end_idx} of {total_controls}</div>', 
-                           unsafe_allow_html=True)
-            
-            with col_nav4:
-                if st.button("Next ➡️", use_container_width=True, disabled=st.session_state.current_page >= total_pages - 1):
-                    st.session_state.current_page = min(total_pages - 1, st.session_state.current_page + 1)
-                    st.rerun()
-            
-            with col_nav5:
-                if st.button("Last ⏭️", use_container_width=True):
-                    st.session_state.current_page = total_pages - 1
-                    st.rerun()
-            
-            # Create professional line chart for current page controls
-            fig_trend = go.Figure()
-            
-            # Color palette for controls
-            colors = px.colors.qualitative.Bold
-            
-            # Add compliance rate lines for each control on current page
-            for i, control in enumerate(current_controls):
-                control_data = trend_df[trend_df['Control'] == control]
-                color = colors[i % len(colors)]
-                
-                fig_trend.add_trace(go.Scatter(
-                    x=control_data['Date'],
-                    y=control_data['Compliance_Rate'],
-                    name=f"{control}",
-                    line=dict(width=3, color=color),
-                    yaxis='y1',
-                    mode='lines+markers',
-                    marker=dict(size=6, symbol='circle'),
-                    hovertemplate=f'<b>{control}</b><br>' +
-                                 'Date: %{x|%b %d}<br>' +
-                                 'Compliance: %{y:.1f}%<br>' +
-                                 'Control Group: %{customdata}<extra></extra>',
-                    customdata=control_data['Control_Group']
-                ))
-            
-            # Add average findings count as bars on secondary y-axis
-            current_controls_data = trend_df[trend_df['Control'].isin(current_controls)]
-            avg_findings = current_controls_data.groupby('Date')['Findings_Count'].mean().reset_index()
-            
-            fig_trend.add_trace(go.Bar(
-                x=avg_findings['Date'],
-                y=avg_findings['Findings_Count'],
-                name="Avg Findings Count",
-                marker_color='rgba(128, 128, 128, 0.4)',
-                yaxis='y2',
-                hovertemplate='Date: %{x|%b %d}<br>' +
-                             'Avg Findings: %{y:.0f}<extra></extra>'
-            ))
-            
-            # Update layout for professional appearance
-            fig_trend.update_layout(
-                title=f"🔄 Control Compliance Trends - Page {st.session_state.current_page + 1}",
-                xaxis=dict(
-                    title="Date",
-                    tickformat="%b %d",
-                    gridcolor='lightgray',
-                    showline=True,
-                    linewidth=1,
-                    linecolor='gray'
-                ),
-                yaxis=dict(
-                    title="Compliance Rate (%)",
-                    range=[60, 100],
-                    gridcolor='lightgray',
-                    tickformat=".0f%",
-                    showline=True,
-                    linewidth=1,
-                    linecolor='gray'
-                ),
-                yaxis2=dict(
-                    title="Average Findings Count",
-                    overlaying='y',
-                    side='right',
-                    gridcolor='rgba(0,0,0,0)',
-                    showline=True,
-                    linewidth=1,
-                    linecolor='gray',
-                    range=[0, max(avg_findings['Findings_Count']) * 1.2]
-                ),
-                height=600,
-                plot_bgcolor='rgba(248,248,248,0.8)',
-                paper_bgcolor='rgba(255,255,255,0.9)',
-                font=dict(family="Arial", size=12),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1,
-                    bgcolor='rgba(255,255,255,0.8)'
-                ),
-                hovermode='x unified'
-            )
-            
-            st.plotly_chart(fig_trend, use_container_width=True)
-            
-            # Control-specific insights
-            st.subheader("📋 Control Performance Summary")
-            
-            # Create metrics for each control on current page
-            cols = st.columns(len(current_controls))
-            for i, control in enumerate(current_controls):
-                control_data = trend_df[trend_df['Control'] == control]
-                current_rate = control_data['Compliance_Rate'].iloc[-1]
-                previous_rate = control_data['Compliance_Rate'].iloc[-7] if len(control_data) > 7 else current_rate
-                trend_delta = current_rate - previous_rate
-                
-                with cols[i]:
-                    st.metric(
-                        label=control,
-                        value=f"{current_rate:.1f}%",
-                        delta=f"{trend_delta:+.1f}%",
-                        delta_color="normal" if trend_delta >= 0 else "inverse"
-                    )
-            
-            # Overall insights
-            st.subheader("💡 Trend Insights")
-            insight_col1, insight_col2, insight_col3 = st.columns(3)
-            
-            with insight_col1:
-                avg_compliance = trend_df[trend_df['Control'].isin(current_controls)]['Compliance_Rate'].mean()
-                st.metric("Average Compliance", f"{avg_compliance:.1f}%")
-            
-            with insight_col2:
-                best_control = max(current_controls, 
-                                 key=lambda x: trend_df[trend_df['Control'] == x]['Compliance_Rate'].iloc[-1])
-                best_rate = trend_df[trend_df['Control'] == best_control]['Compliance_Rate'].iloc[-1]
-                st.metric("Highest Performing", best_control, f"{best_rate:.1f}%")
-            
-            with insight_col3:
-                improvement_controls = []
-                for control in current_controls:
-                    control_data = trend_df[trend_df['Control'] == control]
-                    if len(control_data) > 7:
-                        improvement = control_data['Compliance_Rate'].iloc[-1] - control_data['Compliance_Rate'].iloc[-7]
-                        if improvement > 2:  # Significant improvement threshold
-                            improvement_controls.append(control)
-                
-                st.metric("Rapidly Improving", f"{len(improvement_controls)} controls")
-    
-    with tab3:
-        st.markdown('<div class="section-header">Comprehensive Log Analysis</div>', unsafe_allow_html=True)
-        
-        # Control selector for detailed log viewing
-        controls = df['control'].unique()
-        selected_control = st.selectbox("🎛️ Select Control for Detailed Analysis", controls)
-        
-        if selected_control:
-            control_data = df[df['control'] == selected_control]
-            
-            # Control summary
-            st.subheader(f"📋 Control: {selected_control}")
-            
-            cols = st.columns(4)
-            with cols[0]:
-                st.metric("Total Events", len(control_data))
-            with cols[1]:
-                st.metric("Active Deviations", len(control_data[control_data['status'] == 'deviation']))
-            with cols[2]:
-                st.metric("Successful Remediations", len(control_data[control_data['status'] == 'remediation']))
-            with cols[3]:
-                rate = len(control_data[control_data['status'] == 'remediation']) / len(control_data) * 100
-                st.metric("Success Rate", f"{rate:.1f}%")
-            
-            # Detailed log viewer
-            st.subheader("📄 Raw Log Reports")
-            
-            for idx, row in control_data.iterrows():
-                log_expander = st.expander(
-                    f"{'⚠️' if row['status'] == 'deviation' else '✅'} "
-                    f"{row['s3_key'].split('/')[-1]} | "
-                    f"{row['status'].upper()} | "
-                    f"{row.get('timestamp', 'N/A')}",
-                    expanded=idx < 2
-                )
-                with log_expander:
-                    col1, col2 = st.columns([1, 1])
-                    
-                    with col1:
-                        st.write("**📋 Log Metadata**")
-                        metadata = {
-                            "s3_key": row['s3_key'],
-                            "control_family": row['control'],
-                            "control_full": row['control_full'],
-                            "status": row['status'],
-                            "timestamp": row.get('timestamp', 'N/A'),
-                            "sub_control_type": row.get('sub_control_type', 'N/A')
-                        }
-                        st.json(metadata)
-                    
-                    with col2:
-                        st.write("**🔍 Raw Log Content**")
-                        if isinstance(row['raw_log'], dict):
-                            st.json(row['raw_log'])
-                        else:
-                            st.text_area("Raw Content", str(row['raw_log']), height=300, key=f"raw_{selected_control}_{idx}")
-
-else:
-    st.info("📭 No compliance data found. Please check your S3 bucket configuration or enable S3 data fetching.")
-
-# ---- FOOTER ----
-st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #666; font-size: 14px; padding: 20px;'>
-    <p>🚀 <strong>SOC2 Compliance Dashboard</strong> • Enterprise Security Platform • 
-    Last Updated: {}</p>
-    <p style='font-size: 12px; color: #999;'>Powered by AWS • Streamlit • Automated Compliance Monitoring</p>
-</div>
+import io
+import os
+import hashlib
+import logging
+import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from datetime import datetime, timedelta
+import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+import numpy as np
+import math
+from soc2_audit_logs import AUDIT_LOG_SUFFIXES, LOG_COLUMNS, classify, decode_log, inflate, is_audit_log, read_jsonl
+
+# ---- CONFIG ----
+BUCKET = os.getenv("SOC2_AUDIT_BUCKET", "soc2-audit-logs-central-206299126127")
+PREFIX = os.getenv("SOC2_AUDIT_PREFIX", "audit_reports/")
+ROLLUP_PREFIX = PREFIX + "_rollup/"
+# Prebuilt by dashboard-index-builder.py; one GET replaces parsing every JSON log
+INDEX_KEY = PREFIX + "_index/dashboard.parquet"
+FETCH_WORKERS = 16
+# Pool sized above FETCH_WORKERS so parallel GETs never wait on a connection; short
+# timeouts + standard retries keep one slow object from stalling the whole refresh
+s3 = boto3.client("s3", config=Config(
+    max_pool_connections=32,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=5,
+))
+
+logger = logging.getLogger(__name__)
+
+st.set_page_config(page_title="SOC2 Compliance Dashboard", layout="wide")
+st_autorefresh(interval=60 * 1000, key="s3_data_refresh")
+
+# ---- CUSTOM CSS ----
+st.markdown("""
+<style>
+    .main-header {
+        font-size: 7rem;
+        font-weight: 900;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        text-align: center;
+        margin-bottom: 0.5rem;
+        padding: 20px 0;
+        text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
+    }
+    .sub-header {
+        font-size: 2.8rem;
+        color: #666;
+        text-align: center;
+        margin-bottom: 2rem;
+        font-weight: 300;
+    }
+    .refresh-status {
+        background-color: #e8f4fd;
+        border: 1px solid #bee5eb;
+        border-radius: 8px;
+        padding: 12px;
+        margin: 10px 0;
+        text-align: center;
+        font-weight: 500;
+    }
+    .risk-critical { background-color: #fee2e2 !important; border-left: 4px solid #dc2626 !important; }
+    .risk-high { background-color: #ffedd5 !important; border-left: 4px solid #ea580c !important; }
+    .risk-medium { background-color: #fef3c7 !important; border-left: 4px solid #d97706 !important; }
+    .risk-low { background-color: #f0f9ff !important; border-left: 4px solid #2563eb !important; }
+    .risk-minimal { background-color: #f0fdf4 !important; border-left: 4px solid #16a34a !important; }
+    .log-highlight-critical { border: 2px solid #dc2626 !important; background-color: #fef2f2 !important; }
+    .log-highlight-high { border: 2px solid #ea580c !important; background-color: #fff7ed !important; }
+    .log-highlight-medium { border: 2px solid #d97706 !important; background-color: #fffbeb !important; }
+    .section-header {
+        font-size: 1.8rem;
+        font-weight: 700;
+        color: #2d3748;
+        margin: 2rem 0 1rem 0;
+        padding-bottom: 0.5rem;
+        border-bottom: 3px solid #667eea;
+    }
+    .metric-card {
+        border-radius: 15px;
+        padding: 35px;
+        text-align: center;
+        font-family: 'Arial', sans-serif;
+        transition: all 0.3s ease;
+        color: white;
+        font-weight: bold;
+        cursor: pointer;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        border: none;
+        min-height: 200px;
+        display: flex;
+        flex-direction: column;
+        justify-content: center;
+    }
+    .metric-card:hover {
+        transform: translateY(-5px);
+        box-shadow: 0 8px 15px rgba(0, 0, 0, 0.2);
+    }
+    .metric-value {
+        font-size: 4.5rem;
+        font-weight: 900;
+        margin: 25px 0;
+        text-shadow: 2px 2px 5px rgba(0,0,0,0.4);
+        line-height: 1;
+    }
+    .metric-label {
+        font-size: 1.8rem;
+        font-weight: 700;
+        margin-bottom: 15px;
+        text-transform: uppercase;
+        letter-spacing: 1px;
+        text-shadow: 1px 1px 3px rgba(0,0,0,0.3);       
+    }
+    .metric-trend {
+        font-size: 16px;
+        font-weight: 600;
+    }
+    .metric-row {
+        display: flex;
+        gap: 1rem;
+    }
+    .metric-row .metric-card {
+        flex: 1;
+    }
+    .controls-card { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
+    .total-logs-card { background: linear-gradient(135deg, #00cc96 0%, #00a379 100%); }
+    .deviations-card { background: linear-gradient(135deg, #ef553b 0%, #cc4731 100%); }
+    .remediations-card { background: linear-gradient(135deg, #19d3f3 0%, #15b8d9 100%); }
+    .compliance-card { background: linear-gradient(135deg, #ffbb00 0%, #e6a800 100%); }
+    .pagination-btn {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        border: none;
+        padding: 10px 20px;
+        border-radius: 25px;
+        font-weight: bold;
+        margin: 5px;
+        cursor: pointer;
+        transition: all 0.3s ease;
+    }
+    .pagination-btn:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
+    }
+    .pagination-btn:disabled {
+        background: #cccccc;
+        cursor: not-allowed;
+        transform: none;
+    }
+    .page-indicator {
+        font-size: 1.2rem;
+        font-weight: bold;
+        color: #667eea;
+        padding: 10px 20px;
+        background: #f0f4ff;
+        border-radius: 20px;
+        margin: 0 10px;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+CARD_TEMPLATE = (
+    "<div class='metric-card {cls}'>"
+    "<span class='metric-label'>{label}</span>"
+    "<span class='metric-value'>{value}</span>"
+    "<div class='metric-trend'>{trend}</div>"
+    "</div>"
+)
+
+# ---- SIDEBAR ----
+st.sidebar.title("🔧 SOC2 Controls Dashboard")
+st.sidebar.markdown("---")
+use_s3 = st.sidebar.checkbox("Fetch from S3 bucket", value=True)
+manual_refresh = st.sidebar.button("🔄 Refresh Now")
+
+# Pagination controls in sidebar
+st.sidebar.markdown("---")
+st.sidebar.subheader("📊 Trend Chart Controls")
+controls_per_page = st.sidebar.slider("Controls per page", min_value=3, max_value=8, value=4, help="Number of controls to display per page in the trend chart")
+
+st.sidebar.markdown("---")
+st.sidebar.info("**Dashboard Features:**\n- Real-time compliance monitoring\n- Automated risk assessment\n- Detailed log analysis\n- Executive reporting")
+
+# ---- DATA FETCH ----
+def list_logs():
+    paginator = s3.get_paginator("list_objects_v2")
+    pages = paginator.paginate(Bucket=BUCKET, Prefix=PREFIX, PaginationConfig={"PageSize": 1000})
+    objects = [obj for page in pages for obj in page.get("Contents", [])]
+
+    # Prefer daily rollups (<ROLLUP_PREFIX><family>/<yyyymmdd>.jsonl); individual
+    # findings are only read for family/days that have not been rolled up yet
+    rolled_up = {
+        tuple(obj["Key"][len(ROLLUP_PREFIX):-len(".jsonl")].split("/", 1))
+        for obj in objects
+        if obj["Key"].startswith(ROLLUP_PREFIX) and obj["Key"].endswith(".jsonl")
+    }
+    manifest = []
+    for obj in objects:
+        key = obj["Key"]
+        if key == INDEX_KEY:
+            pass
+        elif key.startswith(ROLLUP_PREFIX):
+            if not key.endswith(".jsonl"):
+                continue
+        elif not key.endswith(AUDIT_LOG_SUFFIXES):
+            continue
+        elif (key[len(PREFIX):].split("/", 1)[0], obj["LastModified"].strftime("%Y%m%d")) in rolled_up:
+            continue
+        manifest.append((key, obj["ETag"], obj["LastModified"].isoformat()))
+    return manifest
+
+@st.cache_data(ttl=30, show_spinner=False)
+def list_logs_cached():
+    """(key, etag, last_modified) listing reused across reruns; errors are not cached."""
+    return list_logs()
+
+def _fetch_bytes(key):
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+def fetch_log(key):
+    return decode_log(key, _fetch_bytes(key))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_raw_log(key):
+    """Full log body for one key; audit objects are write-once, so no TTL is needed."""
+    return fetch_log(key)
+
+def parse_logs(keys):
+    # Prefetch all bodies concurrently; S3 round-trips dominate, parsing is cheap
+    bodies = {}
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = {pool.submit(_fetch_bytes, k): k for k in keys}
+        for future in as_completed(futures):
+            try:
+                bodies[futures[future]] = future.result()
+            except Exception as e:
+                logger.warning("Skipping s3://%s/%s: %s", BUCKET, futures[future], e)
+
+    records = []
+    for k in keys:
+        if k not in bodies:
+            continue
+        if k.endswith(".jsonl"):
+            records.extend((r["s3_key"], r["log"]) for r in read_jsonl(inflate(bodies[k])))
+        else:
+            records.append((k, decode_log(k, bodies[k])))
+
+    # Log bodies are not kept in the cached frame; tab3 loads them per key on demand
+    return classify(records)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_logs(manifest):
+    """Parse logs for a (key, etag, last_modified) manifest; cached until S3 contents change."""
+    return parse_logs([key for key, _, _ in manifest])
+
+@st.cache_data(show_spinner=False)
+def load_index(etag):
+    """Read the prebuilt Parquet index; cached per index version (ETag)."""
+    body = s3.get_object(Bucket=BUCKET, Key=INDEX_KEY)["Body"].read()
+    return pd.read_parquet(io.BytesIO(body), columns=LOG_COLUMNS)
+
+# ---- TREND DATA ----
+@st.cache_data(show_spinner=False)
+def build_trend_df(controls, end_date):
+    """Generate realistic 30-day trend data for each control, ending on end_date."""
+    n_days = 30
+    n_controls = len(controls)
+    rng = np.random.default_rng(42)  # For consistent demo data
+    dates = pd.date_range(end=end_date, periods=n_days, freq='D')
+    
+    # One row per control, one column per day; unique trend pattern for each control
+    base_compliance = rng.uniform(75, 95, size=n_controls)
+    trend_strength = rng.uniform(0.001, 0.01, size=n_controls)
+    i = np.arange(n_days)
+    noise = rng.normal(0, 3, size=(n_controls, n_days))
+    compliance = np.clip(base_compliance[:, None] * (1 + i * trend_strength[:, None]) + noise, 65, 99).ravel()
+    
+    # Simulate findings count inversely related to compliance
+    findings = np.maximum(0, (rng.poisson(8, size=compliance.size) * (100 - compliance) / 35).astype(int))
+    
+    return pd.DataFrame({
+        'Date': np.tile(dates.values, n_controls),
+        'Control': np.repeat(np.asarray(controls, dtype=object), n_days),
+        'Compliance_Rate': compliance,
+        'Findings_Count': findings,
+        'Control_Group': np.tile([f"Group {(d % 3) + 1}" for d in range(n_days)], n_controls)  # For additional grouping
+    })
+
+@st.cache_data(show_spinner=False)
+def paginate_controls(controls, per_page):
+    """Split the sorted control names into pages of at most per_page controls."""
+    return np.array_split(np.asarray(controls, dtype=object), math.ceil(len(controls) / per_page))
+
+# ---- CHART BUILDERS ----
+# Figures are cached on a content fingerprint, so reruns that don't change the
+# underlying data (pagination, autorefresh) reuse the already-built figure
+# Gauge and pie are read-only; skip plotly.js interactivity for them
+STATIC_CHART_CONFIG = {"staticPlot": True, "displayModeBar": False}
+
+def _frame_digest(frame):
+    return hashlib.md5(pd.util.hash_pandas_object(frame, index=True).values).digest()
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_digest})
+def build_pie(dev_chart_data):
+    # Create custom colors for the pie chart
+    colors = px.colors.sequential.RdBu_r
+
+    fig_pie = px.pie(
+        dev_chart_data, 
+        names="Control", 
+        values="Count", 
+        hole=0.4,
+        color_discrete_sequence=colors
+    )
+
+    fig_pie.update_traces(
+        textposition='outside',
+        textinfo='percent+label',
+        textfont=dict(
+            size=18,
+            color='black',
+            family="Arial",
+            weight='bold'
+        ),
+        marker=dict(line=dict(color='white', width=2)),
+        textfont_size=18,
+        insidetextorientation='horizontal'
+    )
+
+    fig_pie.update_layout(
+        height=550,
+        legend=dict(
+            font=dict(
+                size=16,
+                family="Arial",
+                weight='bold'
+            ),
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.1
+        ),
+        annotations=[dict(
+            text='Deviations<br>by Control',
+            x=0.5, y=0.5,
+            font=dict(
+                size=20,
+                color='gray',
+                weight='bold'
+            ),
+            showarrow=False,
+        )],
+        font=dict(
+            family="Arial",
+            size=16,
+            color="black"
+        )
+    )
+    return fig_pie
+
+@st.cache_data(show_spinner=False)
+def build_gauge(overall_rate):
+    fig_gauge = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = overall_rate,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': "Overall Compliance Rate", 'font': {'size': 16}},
+        delta = {'reference': 90, 'increasing': {'color': "green"}},
+        gauge = {
+            'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': "darkblue"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, 70], 'color': 'red'},
+                {'range': [70, 90], 'color': 'yellow'},
+                {'range': [90, 100], 'color': 'green'}],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90}}
+    ))
+
+    fig_gauge.update_layout(height=300, margin=dict(l=20, r=20, t=50, b=20))
+    return fig_gauge
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_digest})
+def build_trend_figure(page_controls, page_df, page_number):
+    # Create professional line chart for current page controls
+    by_control = {name: grp for name, grp in page_df.groupby("Control", sort=False)}
+    fig_trend = go.Figure()
+
+    # Color palette for controls
+    colors = px.colors.qualitative.Bold
+
+    # Add compliance rate lines for each control on current page
+    for i, control in enumerate(page_controls):
+        control_data = by_control[control]
+        color = colors[i % len(colors)]
+
+        fig_trend.add_trace(go.Scatter(
+            x=control_data['Date'],
+            y=control_data['Compliance_Rate'],
+            name=f"{control}",
+            line=dict(width=3, color=color),
+            yaxis='y1',
+            mode='lines+markers',
+            marker=dict(size=6, symbol='circle'),
+            hovertemplate=f'<b>{control}</b><br>' +
+                         'Date: %{x|%b %d}<br>' +
+                         'Compliance: %{y:.1f}%<br>' +
+                         'Control Group: %{customdata}<extra></extra>',
+            customdata=control_data['Control_Group']
+        ))
+
+    # Add average findings count as bars on secondary y-axis
+    avg_findings = page_df.groupby('Date')['Findings_Count'].mean().reset_index()
+
+    fig_trend.add_trace(go.Bar(
+        x=avg_findings['Date'],
+        y=avg_findings['Findings_Count'],
+        name="Avg Findings Count",
+        marker_color='rgba(128, 128, 128, 0.4)',
+        yaxis='y2',
+        hovertemplate='Date: %{x|%b %d}<br>' +
+                     'Avg Findings: %{y:.0f}<extra></extra>'
+    ))
+
+    # Update layout for professional appearance
+    fig_trend.update_layout(
+        title=f"🔄 Control Compliance Trends - Page {page_number}",
+        xaxis=dict(
+            title="Date",
+            tickformat="%b %d",
+            gridcolor='lightgray',
+            showline=True,
+            linewidth=1,
+            linecolor='gray'
+        ),
+        yaxis=dict(
+            title="Compliance Rate (%)",
+            range=[60, 100],
+            gridcolor='lightgray',
+            tickformat=".0f%",
+            showline=True,
+            linewidth=1,
+            linecolor='gray'
+        ),
+        yaxis2=dict(
+            title="Average Findings Count",
+            overlaying='y',
+            side='right',
+            gridcolor='rgba(0,0,0,0)',
+            showline=True,
+            linewidth=1,
+            linecolor='gray',
+            range=[0, max(avg_findings['Findings_Count']) * 1.2]
+        ),
+        height=600,
+        plot_bgcolor='rgba(248,248,248,0.8)',
+        paper_bgcolor='rgba(255,255,255,0.9)',
+        font=dict(family="Arial", size=12),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            bgcolor='rgba(255,255,255,0.8)'
+        ),
+        hovermode='x unified',
+        uirevision="trend"  # keep zoom/legend state across reruns
+    )
+    return fig_trend
+
+# ---- MAIN LAYOUT ----
+st.markdown('<h1 class="main-header">📊 SOC2 Compliance Dashboard</h1>', unsafe_allow_html=True)
+st.markdown('<p class="sub-header">Enterprise-Grade Security & Compliance Monitoring Platform</p>', unsafe_allow_html=True)
+
+# Auto-refresh status
+refresh_time = datetime.now() + timedelta(minutes=1)
+st.markdown(f"""
+<div class="refresh-status">
+    🔄 Auto-refresh enabled • Next update: <span style="font-weight:bold;">{refresh_time.strftime('%H:%M:%S')}</span>
+</div>
+""", unsafe_allow_html=True)
+
+if manual_refresh:
+    # Force a fresh LIST; unchanged objects are still served from the load_logs cache
+    list_logs_cached.clear()
+
+if use_s3 or manual_refresh:
+    with st.spinner("🔄 Fetching latest compliance data from S3..."):
+        try:
+            manifest = tuple(list_logs_cached())
+        except Exception as e:
+            st.sidebar.error(f"S3 Error: {e}")
+            manifest = ()
+        index_entry = next((entry for entry in manifest if entry[0] == INDEX_KEY), None)
+        log_manifest = tuple(entry for entry in manifest if entry[0] != INDEX_KEY)
+        # Use the index only once it has caught up with every log in the listing. Compare only the keys
+        # the builder indexes (same predicate); rollups never trigger it, so they would always look newer
+        if index_entry and all(
+            index_entry[2] >= last_modified
+            for key, _, last_modified in log_manifest
+            if is_audit_log(key, PREFIX)
+        ):
+            df = load_index(index_entry[1])
+        else:
+            df = load_logs(log_manifest) if log_manifest else pd.DataFrame()
+else:
+    df = pd.DataFrame()
+
+# ---- ENHANCED METRICS CARDS ----
+total_logs = len(df)
+deviations = len(df[df["status"] == "deviation"]) if not df.empty else 0
+remediations = len(df[df["status"] == "remediation"]) if not df.empty else 0
+compliance_pct = round(remediations / (deviations + remediations) * 100, 1) if (deviations + remediations) > 0 else None
+compliance_rate = f"{compliance_pct:.1f}%" if compliance_pct is not None else "—"
+
+cards = [
+    {"cls": "controls-card", "label": "Controls Automated", "value": 9, "trend": "✓ Production Ready"},
+    {"cls": "total-logs-card", "label": "Total Logs", "value": total_logs,
+     "trend": f"{'📈' if total_logs > 0 else '➡️'} Real-time"},
+    {"cls": "deviations-card", "label": "Active Deviations", "value": deviations,
+     "trend": f"{'⚠️' if deviations > 0 else '✅'} Requires Attention"},
+    {"cls": "remediations-card", "label": "Remediations", "value": remediations,
+     "trend": f"{'🚀' if remediations > 0 else '➡️'} Auto-resolved"},
+    {"cls": "compliance-card", "label": "Compliance Rate", "value": compliance_rate,
+     "trend": f"{'✅' if compliance_pct is not None and compliance_pct > 90 else '⚠️'} SOC2 Ready"},
+]
+# One markdown element for the whole row instead of five
+st.markdown(
+    "<div class='metric-row'>" + "".join(CARD_TEMPLATE.format(**c) for c in cards) + "</div>",
+    unsafe_allow_html=True
+)
+
+st.markdown("---")
+
+# ---- ENHANCED CHARTS & VISUALIZATIONS ----
+if not df.empty:
+    # Create tabs for better organization
+    tab1, tab2, tab3 = st.tabs(["📊 Compliance Overview",  "📈 Trend Analysis", "🔍 Raw Logs"])
+    
+    with tab1:
+        st.markdown('<div class="section-header">Compliance Overview Dashboard</div>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            # Enhanced Deviations Pie Chart
+            st.subheader("🔄 Control Deviation Distribution")
+            dev_chart_data = df[df["status"] == "deviation"]["control"].value_counts().reset_index()
+            dev_chart_data.columns = ["Control", "Count"]
+            
+            if not dev_chart_data.empty:
+                fig_pie = build_pie(dev_chart_data)
+                st.plotly_chart(fig_pie, use_container_width=True, config=STATIC_CHART_CONFIG)
+            else:
+                st.info("🎉 No deviations detected across all controls!")
+        
+        with col2:
+            # Compliance Status Summary
+            st.subheader("📈 Compliance Status")
+            
+            # Create gauge chart for overall compliance
+            overall_rate = compliance_pct if compliance_pct is not None else 0
+            
+            fig_gauge = build_gauge(overall_rate)
+            st.plotly_chart(fig_gauge, use_container_width=True, config=STATIC_CHART_CONFIG)
+            
+            # Quick Stats
+            st.subheader("📋 Quick Statistics")
+            st.metric("Total Controls Monitored", len(df['control'].unique()))
+            st.metric("Automation Coverage", "100%")
+            st.metric("Data Freshness", "Real-time")
+    
+    with tab2:
+        st.markdown('<div class="section-header">Compliance Trend Analysis</div>', unsafe_allow_html=True)
+        
+        # Generate synthetic time series data for ALL controls
+        all_controls = tuple(sorted(df['control'].unique()))
+        
+        # Initialize session state for pagination
+        if 'current_page' not in st.session_state:
+            st.session_state.current_page = 0
+        
+        # Seeded demo data only changes with the control set or the day
+        trend_df = build_trend_df(all_controls, datetime.now().strftime('%Y-%m-%d'))
+        
+        if not trend_df.empty:
+            # Split once per render instead of boolean-masking trend_df for every control
+            by_control = {name: grp for name, grp in trend_df.groupby("Control", sort=False)}
+            last_rates = trend_df.sort_values("Date").groupby("Control")["Compliance_Rate"].last()
+            
+            # Calculate pagination
+            pages = paginate_controls(all_controls, controls_per_page)
+            total_controls = len(all_controls)
+            total_pages = len(pages)
+            # Changing "Controls per page" can leave the saved page past the end
+            st.session_state.current_page = min(st.session_state.current_page, total_pages - 1)
+            
+            # Get controls for current page
+            current_controls = pages[st.session_state.current_page]
+            start_idx = sum(len(page) for page in pages[:st.session_state.current_page])
+            end_idx = start_idx + len(current_controls)
+            
+            # Pagination controls
+            st.subheader(f"📊 Real-time Control Compliance Trends")
+            
+            # Page navigation
+            col_nav1, col_nav2, col_nav3, col_nav4, col_nav5 = st.columns([1, 1, 2, 1, 1])
+            
+            with col_nav1:
+                if st.button("⏮️ First", use_container_width=True):
+                    st.session_state.current_page = 0
+                    st.rerun()
+            
+            with col_nav2:
+                if st.button("⬅️ Previous", use_container_width=True, disabled=st.session_state.current_page == 0):
+                    st.session_state.current_page = max(0, st.session_state.current_page - 1)
+                    st.rerun()
+            
+            with col_nav3:
+                st.markdown(f'<div class="page-indicator">Page {st.session_state.current_page + 1} of {total_pages} | Controls {start_idx + 1}-{end_idx} of {total_controls}</div>', 
+                           unsafe_allow_html=True)
+            
+            with col_nav4:
+                if st.button("Next ➡️", use_container_width=True, disabled=st.session_state.current_page >= total_pages - 1):
+                    st.session_state.current_page = min(total_pages - 1, st.session_state.current_page + 1)
+                    st.rerun()
+            
+            with col_nav5:
+                if st.button("Last ⏭️", use_container_width=True):
+                    st.session_state.current_page = total_pages - 1
+                    st.rerun()
+            
+            current_controls_data = pd.concat([by_control[control] for control in current_controls])
+            fig_trend = build_trend_figure(tuple(current_controls), current_controls_data, st.session_state.current_page + 1)
+            st.plotly_chart(fig_trend, use_container_width=True)
+            
+            # Control-specific insights
+            st.subheader("📋 Control Performance Summary")
+            
+            # Create metrics for each control on current page
+            cols = st.columns(len(current_controls))
+            for i, control in enumerate(current_controls):
+                control_data = by_control[control]
+                current_rate = control_data['Compliance_Rate'].iloc[-1]
+                previous_rate = control_data['Compliance_Rate'].iloc[-7] if len(control_data) > 7 else current_rate
+                trend_delta = current_rate - previous_rate
+                
+                with cols[i]:
+                    st.metric(
+                        label=control,
+                        value=f"{current_rate:.1f}%",
+                        delta=f"{trend_delta:+.1f}%",
+                        delta_color="normal" if trend_delta >= 0 else "inverse"
+                    )
+            
+            # Overall insights
+            st.subheader("💡 Trend Insights")
+            insight_col1, insight_col2, insight_col3 = st.columns(3)
+            
+            with insight_col1:
+                avg_compliance = current_controls_data['Compliance_Rate'].mean()
+                st.metric("Average Compliance", f"{avg_compliance:.1f}%")
+            
+            with insight_col2:
+                page_rates = last_rates.reindex(current_controls)
+                best_control = page_rates.idxmax()
+                best_rate = page_rates.max()
+                st.metric("Highest Performing", best_control, f"{best_rate:.1f}%")
+            
+            with insight_col3:
+                improvement_controls = []
+                for control in current_controls:
+                    control_data = by_control[control]
+                    if len(control_data) > 7:
+                        improvement = control_data['Compliance_Rate'].iloc[-1] - control_data['Compliance_Rate'].iloc[-7]
+                        if improvement > 2:  # Significant improvement threshold
+                            improvement_controls.append(control)
+                
+                st.metric("Rapidly Improving", f"{len(improvement_controls)} controls")
+    
+    with tab3:
+        st.markdown('<div class="section-header">Comprehensive Log Analysis</div>', unsafe_allow_html=True)
+        
+        # Control selector for detailed log viewing
+        controls = df['control'].unique()
+        selected_control = st.selectbox("🎛️ Select Control for Detailed Analysis", controls)
+        
+        if selected_control:
+            control_data = df[df['control'] == selected_control]
+            
+            # Control summary
+            st.subheader(f"📋 Control: {selected_control}")
+            
+            cols = st.columns(4)
+            with cols[0]:
+                st.metric("Total Events", len(control_data))
+            with cols[1]:
+                st.metric("Active Deviations", len(control_data[control_data['status'] == 'deviation']))
+            with cols[2]:
+                st.metric("Successful Remediations", len(control_data[control_data['status'] == 'remediation']))
+            with cols[3]:
+                rate = len(control_data[control_data['status'] == 'remediation']) / len(control_data) * 100
+                st.metric("Success Rate", f"{rate:.1f}%")
+            
+            # Detailed log viewer
+            st.subheader("📄 Raw Log Reports")
+            
+            for i, row in enumerate(control_data.itertuples(index=False)):
+                log_expander = st.expander(
+                    f"{'⚠️' if row.status == 'deviation' else '✅'} "
+                    f"{row.s3_key.split('/')[-1]} | "
+                    f"{row.status.upper()} | "
+                    f"{row.timestamp if row.timestamp else 'N/A'}",
+                    expanded=i < 2
+                )
+                with log_expander:
+                    col1, col2 = st.columns([1, 1])
+                    
+                    with col1:
+                        st.write("**📋 Log Metadata**")
+                        metadata = {
+                            "s3_key": row.s3_key,
+                            "control_family": row.control,
+                            "control_full": row.control_full,
+                            "status": row.status,
+                            "timestamp": row.timestamp if row.timestamp else 'N/A',
+                            "sub_control_type": row.sub_control_type if pd.notna(row.sub_control_type) else 'N/A'
+                        }
+                        st.json(metadata)
+                    
+                    with col2:
+                        st.write("**🔍 Raw Log Content**")
+                        if st.checkbox("Load raw log", value=i < 2, key=f"load_{selected_control}_{i}"):
+                            raw_log = load_raw_log(row.s3_key)
+                            if isinstance(raw_log, dict):
+                                st.json(raw_log)
+                            else:
+                                st.text_area("Raw Content", str(raw_log), height=300, key=f"raw_{selected_control}_{i}")
+
+else:
+    st.info("📭 No compliance data found. Please check your S3 bucket configuration or enable S3 data fetching.")
+
+# ---- FOOTER ----
+st.markdown("---")
+st.markdown("""
+<div style='text-align: center; color: #666; font-size: 14px; padding: 20px;'>
+    <p>🚀 <strong>SOC2 Compliance Dashboard</strong> • Enterprise Security Platform • 
+    Last Updated: {}</p>
+    <p style='font-size: 12px; color: #999;'>Powered by AWS • Streamlit • Automated Compliance Monitoring</p>
+</div>
 """.format(datetime.now().strftime("%Y-%m-%d %H:%M:%S")), unsafe_allow_html=True)
\ No newline at end of file
@@ -1,182 +1,264 @@
-# detector.py
-"""
-SOC2 CC7.2 Detector Lambda
-Handler: detector.lambda_handler
-
-Environment variables:
-- BUCKET (required): S3 bucket name where findings will be written
-- FINDINGS_PREFIX (optional): e.g., "audit_reports/findings"
-- SNS_TOPIC_ARN (optional): ARN of SNS topic to publish a short summary
-- DETECT_PORTS (optional): "ALL" or comma-separated ports (e.g., "22,3389,3306"). Default ALL.
-"""
-
-import os
-import json
-import uuid
-import boto3
-import datetime
-import logging
-from typing import Optional, Set
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-ec2 = boto3.client("ec2")
-s3 = boto3.client("s3")
-sns = boto3.client("sns")
-
-BUCKET = os.environ["BUCKET"]
-FINDINGS_PREFIX = os.environ.get("FINDINGS_PREFIX", "audit_reports/findings")
-SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
-DETECT_PORTS = os.environ.get("DETECT_PORTS", "ALL")  # "ALL" or csv of ints
-
-def _parse_ports(raw: str) -> Optional[Set[int]]:
-    raw = (raw or "").strip().upper()
-    if raw in ("", "ALL"):
-        return None
-    out = set()
-    for p in raw.split(","):
-        p = p.strip()
-        if not p:
-            continue
-        try:
-            out.add(int(p))
-        except ValueError:
-            logger.warning("Ignoring invalid port in DETECT_PORTS: %r", p)
-    return out
-
-DETECT_PORT_SET = _parse_ports(DETECT_PORTS)
-
-def _is_world_cidr(cidr: Optional[str]) -> bool:
-    return cidr in ("0.0.0.0/0", "::/0")
-
-def _perm_matches_ports(perm: dict) -> bool:
-    """Return True if this permission matches DETECT_PORT_SET filter.
-    If DETECT_PORT_SET is None, match everything."""
-    if DETECT_PORT_SET is None:
-        return True
-    ip_proto = perm.get("IpProtocol")
-    from_port = perm.get("FromPort")
-    to_port = perm.get("ToPort")
-    if ip_proto in ("tcp", "udp") and from_port is not None and to_port is not None:
-        for p in DETECT_PORT_SET:
-            if from_port <= p <= to_port:
-                return True
-    return False
-
-def _now_iso() -> str:
-    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
-
-def lambda_handler(event, context):
-    account_id = None
-    try:
-        account_id = context.invoked_function_arn.split(":")[4] if context and getattr(context, "invoked_function_arn", None) else None
-    except Exception:
-        account_id = None
-    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
-
-    logger.info("Starting CC7.2 detector | account=%s region=%s", account_id, region)
-    findings = []
-
-    paginator = ec2.get_paginator("describe_security_groups")
-    for page in paginator.paginate():
-        for sg in page.get("SecurityGroups", []):
-            group_id = sg.get("GroupId")
-            group_name = sg.get("GroupName")
-            vpc_id = sg.get("VpcId")
-            for perm in sg.get("IpPermissions", []):
-                if not _perm_matches_ports(perm):
-                    continue
-                ip_proto = perm.get("IpProtocol")
-                from_port = perm.get("FromPort")
-                to_port = perm.get("ToPort")
-
-                # IPv4 ranges
-                for r in perm.get("IpRanges", []):
-                    cidr = r.get("CidrIp")
-                    if _is_world_cidr(cidr):
-                        findings.append({
-                            "findingId": str(uuid.uuid4()),
-                            "control": "SOC2-CC7.2",
-                            "detectedAt": _now_iso(),
-                            "accountId": account_id,
-                            "region": region,
-                            "groupId": group_id,
-                            "groupName": group_name,
-                            "vpcId": vpc_id,
-                            "direction": "ingress",
-                            "ipProtocol": ip_proto,
-                            "fromPort": from_port,
-                            "toPort": to_port,
-                            "cidr": cidr,
-                            "ipv6Cidr": None,
-                            "risk": "Security group ingress open to world",
-                            "remediationEligible": True,
-                            "metadata": {"description": r.get("Description")}
-                        })
-
-                # IPv6 ranges
-                for r in perm.get("Ipv6Ranges", []):
-                    cidr6 = r.get("CidrIpv6")
-                    if _is_world_cidr(cidr6):
-                        findings.append({
-                            "findingId": str(uuid.uuid4()),
-                            "control": "SOC2-CC7.2",
-                            "detectedAt": _now_iso(),
-                            "accountId": account_id,
-                            "region": region,
-                            "groupId": group_id,
-                            "groupName": group_name,
-                            "vpcId": vpc_id,
-                            "direction": "ingress",
-                            "ipProtocol": ip_proto,
-                            "fromPort": from_port,
-                            "toPort": to_port,
-                            "cidr": None,
-                            "ipv6Cidr": cidr6,
-                            "risk": "Security group ingress open to world (IPv6)",
-                            "remediationEligible": True,
-                            "metadata": {"description": r.get("Description")}
-                        })
-
-    ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    key = f"{FINDINGS_PREFIX}/cc72-findings-{ts}-{uuid.uuid4().hex[:8]}.json"
-
-    doc = {
-        "schemaVersion": "2025-09-10",
-        "control": "SOC2-CC7.2",
-        "generator": "cc72-detector-lambda",
-        "accountId": account_id,
-        "region": region,
-        "detectedAt": _now_iso(),
-        "filters": {"ports": "ALL" if DETECT_PORT_SET is None else sorted(list(DETECT_PORT_SET))},
-        "findingsCount": len(findings),
-        "findings": findings
-    }
-
-    s3.put_object(
-        Bucket=BUCKET,
-        Key=key,
-        Body=json.dumps(doc, indent=2).encode("utf-8"),
-        ContentType="application/json"
-    )
-    logger.info("Wrote findings to s3://%s/%s (count=%d)", BUCKET, key, len(findings))
-
-    if SNS_TOPIC_ARN:
-        msg = {
-            "summary": f"CC7.2 Detector found {len(findings)} open-to-world SG rule(s)",
-            "bucket": BUCKET,
-            "key": key,
-            "region": region,
-            "accountId": account_id,
-        }
-        try:
-            sns.publish(
-                TopicArn=SNS_TOPIC_ARN,
-                Message=json.dumps(msg),
-                Subject=f"[SOC2 CC7.2] Detector findings: {len(findings)} rule(s)"
-            )
-        except Exception as e:
-            logger.exception("Failed to publish SNS: %s", e)
-
-    return {"status": "OK", "s3Key": key, "count": len(findings)}
+# detector.py
+"""
+SOC2 CC7.2 Detector Lambda
+Handler: detector.lambda_handler
+Package soc2_aws.py alongside.
+
+Environment variables:
+- BUCKET (required): S3 bucket name where findings will be written
+- FINDINGS_PREFIX (optional): e.g., "audit_reports/findings"
+  Findings are written as gzipped NDJSON (<prefix>/cc72-findings-<ts>-<id>.ndjson.gz):
+  the first line is the run header, followed by one finding per line.
+- SNS_TOPIC_ARN (optional): ARN of SNS topic to publish a short summary
+- PER_FINDING_ALERTS (optional): "1" to also publish one SNS message per finding (batched 10 per call). Default off.
+- DETECT_PORTS (optional): "ALL" or comma-separated ports (e.g., "22,3389,3306"). Default ALL.
+- REGIONS (optional): comma-separated regions to scan in parallel (e.g., "us-east-1,eu-west-1"). Default: the Lambda's region.
+- WARM_INIT (optional): "1" to open client connections in the background during cold start. Default off.
+"""
+
+import io
+import os
+import gzip
+import bisect
+import orjson
+import uuid
+import boto3
+import datetime
+import logging
+import threading
+from boto3.s3.transfer import TransferConfig
+from soc2_aws import client_config, publish_batch
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CLIENT_CONFIG = client_config()
+
+s3 = boto3.client("s3", config=CLIENT_CONFIG)
+# Typical findings files go up in a single PUT; only very large ones switch to multipart
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, use_threads=False)
+sns = boto3.client("sns", config=CLIENT_CONFIG)
+
+BUCKET = os.environ["BUCKET"]
+FINDINGS_PREFIX = os.environ.get("FINDINGS_PREFIX", "audit_reports/findings")
+SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
+DETECT_PORTS = os.environ.get("DETECT_PORTS", "ALL")  # "ALL" or csv of ints
+PER_FINDING_ALERTS = os.environ.get("PER_FINDING_ALERTS") == "1"
+REGIONS = [r.strip() for r in os.environ.get("REGIONS", "").split(",") if r.strip()] or [boto3.Session().region_name]
+
+# One EC2 client per scanned region
+ec2_clients = {r: boto3.client("ec2", region_name=r, config=CLIENT_CONFIG) for r in REGIONS}
+
+def _warm_clients():
+    """Resolve credentials and open TLS connections before the first real call; failures are harmless."""
+    calls = [lambda c=c, r=r: c.describe_regions(RegionNames=[r]) for r, c in ec2_clients.items()]
+    calls.append(lambda: s3.head_bucket(Bucket=BUCKET))
+    for call in calls:
+        try:
+            call()
+        except Exception as e:
+            logger.debug("Warm-up call failed: %s", e)
+
+if os.environ.get("WARM_INIT") == "1":
+    threading.Thread(target=_warm_clients, daemon=True).start()
+
+def _parse_ports(raw: str) -> Optional[Set[int]]:
+    raw = (raw or "").strip().upper()
+    if raw in ("", "ALL"):
+        return None
+    out = set()
+    for p in raw.split(","):
+        p = p.strip()
+        if not p:
+            continue
+        try:
+            out.add(int(p))
+        except ValueError:
+            logger.warning("Ignoring invalid port in DETECT_PORTS: %r", p)
+    return out
+
+DETECT_PORT_SET = _parse_ports(DETECT_PORTS)
+# Sorted copy for range lookups in _perm_matches_ports
+DETECT_PORT_SET_SORTED = sorted(DETECT_PORT_SET) if DETECT_PORT_SET is not None else None
+
+_WORLD_CIDRS = frozenset({"0.0.0.0/0", "::/0"})
+
+def _perm_matches_ports(perm: dict) -> bool:
+    """Return True if this permission matches DETECT_PORT_SET filter.
+    If DETECT_PORT_SET is None, match everything."""
+    if DETECT_PORT_SET is None:
+        return True
+    ip_proto = perm.get("IpProtocol")
+    from_port = perm.get("FromPort")
+    to_port = perm.get("ToPort")
+    if ip_proto in ("tcp", "udp") and from_port is not None and to_port is not None:
+        if from_port == to_port:
+            return from_port in DETECT_PORT_SET
+        # Smallest watched port >= from_port; the range matches if it is also <= to_port
+        i = bisect.bisect_left(DETECT_PORT_SET_SORTED, from_port)
+        return i < len(DETECT_PORT_SET_SORTED) and DETECT_PORT_SET_SORTED[i] <= to_port
+    return False
+
+def _emit_findings(key: str, header: dict, findings: list) -> None:
+    """Stream the header line plus one line per finding into a gzipped NDJSON upload."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=1) as gz:
+        gz.write(orjson.dumps(header, option=orjson.OPT_APPEND_NEWLINE))
+        for f in findings:
+            gz.write(orjson.dumps(f, option=orjson.OPT_APPEND_NEWLINE))
+    buf.seek(0)
+    s3.upload_fileobj(
+        buf,
+        BUCKET,
+        key,
+        ExtraArgs={"ContentType": "application/x-ndjson", "ContentEncoding": "gzip"},
+        Config=TRANSFER_CONFIG
+    )
+
+def _publish_findings(findings: list) -> None:
+    """Publish one SNS message per finding, up to 10 per PublishBatch call."""
+    publish_batch(sns, SNS_TOPIC_ARN, (
+        {"Subject": "[SOC2 CC7.2] Open-to-world SG rule", "Message": orjson.dumps(f).decode()}
+        for f in findings
+    ))
+
+def _scan_region(region: str, account_id: Optional[str], detected_at: str) -> list:
+    """Return open-to-world ingress findings for every security group in one region."""
+    findings = []
+    # (group, protocol, from, to, cidr, ipv6 cidr) already reported; repeated range entries are written once
+    seen = set()
+
+    paginator = ec2_clients[region].get_paginator("describe_security_groups")
+    for page in paginator.paginate():
+        for sg in page.get("SecurityGroups", []):
+            group_id = sg.get("GroupId")
+            group_name = sg.get("GroupName")
+            vpc_id = sg.get("VpcId")
+            for perm in sg.get("IpPermissions", []):
+                if not _perm_matches_ports(perm):
+                    continue
+                ip_proto = perm.get("IpProtocol")
+                from_port = perm.get("FromPort")
+                to_port = perm.get("ToPort")
+
+                # IPv4 ranges
+                for r in perm.get("IpRanges", []):
+                    cidr = r.get("CidrIp")
+                    if cidr in _WORLD_CIDRS:
+                        k = (group_id, ip_proto, from_port, to_port, cidr, None)
+                        if k in seen:
+                            continue
+                        seen.add(k)
+                        findings.append({
+                            "findingId": str(uuid.uuid4()),
+                            "control": "SOC2-CC7.2",
+                            "detectedAt": detected_at,
+                            "accountId": account_id,
+                            "region": region,
+                            "groupId": group_id,
+                            "groupName": group_name,
+                            "vpcId": vpc_id,
+                            "direction": "ingress",
+                            "ipProtocol": ip_proto,
+                            "fromPort": from_port,
+                            "toPort": to_port,
+                            "cidr": cidr,
+                            "ipv6Cidr": None,
+                            "risk": "Security group ingress open to world",
+                            "remediationEligible": True,
+                            "metadata": {"description": r.get("Description")}
+                        })
+
+                # IPv6 ranges
+                for r in perm.get("Ipv6Ranges", []):
+                    cidr6 = r.get("CidrIpv6")
+                    if cidr6 in _WORLD_CIDRS:
+                        k = (group_id, ip_proto, from_port, to_port, None, cidr6)
+                        if k in seen:
+                            continue
+                        seen.add(k)
+                        findings.append({
+                            "findingId": str(uuid.uuid4()),
+                            "control": "SOC2-CC7.2",
+                            "detectedAt": detected_at,
+                            "accountId": account_id,
+                            "region": region,
+                            "groupId": group_id,
+                            "groupName": group_name,
+                            "vpcId": vpc_id,
+                            "direction": "ingress",
+                            "ipProtocol": ip_proto,
+                            "fromPort": from_port,
+                            "toPort": to_port,
+                            "cidr": None,
+                            "ipv6Cidr": cidr6,
+                            "risk": "Security group ingress open to world (IPv6)",
+                            "remediationEligible": True,
+                            "metadata": {"description": r.get("Description")}
+                        })
+
+    logger.info("Scanned region %s (findings=%d)", region, len(findings))
+    return findings
+
+def lambda_handler(event, context):
+    account_id = None
+    try:
+        account_id = context.invoked_function_arn.split(":")[4] if context and getattr(context, "invoked_function_arn", None) else None
+    except Exception:
+        account_id = None
+    region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+
+    logger.info("Starting CC7.2 detector | account=%s region=%s regions=%s", account_id, region, REGIONS)
+
+    # One timestamp per run, shared by every finding, the header and the key
+    run_dt = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    detected_at = run_dt.isoformat()
+
+    # Regions are independent and the scan is all round-trips, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(REGIONS)) as pool:
+        findings = [f for region_findings in pool.map(lambda r: _scan_region(r, account_id, detected_at), REGIONS) for f in region_findings]
+
+    ts = run_dt.strftime("%Y%m%dT%H%M%SZ")
+    key = f"{FINDINGS_PREFIX}/cc72-findings-{ts}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+
+    header = {
+        "schemaVersion": "2025-09-10",
+        "control": "SOC2-CC7.2",
+        "generator": "cc72-detector-lambda",
+        "accountId": account_id,
+        "region": region,
+        "regions": REGIONS,
+        "detectedAt": detected_at,
+        "filters": {"ports": "ALL" if DETECT_PORT_SET is None else sorted(list(DETECT_PORT_SET))},
+        "findingsCount": len(findings)
+    }
+
+    _emit_findings(key, header, findings)
+    logger.info("Wrote findings to s3://%s/%s (count=%d)", BUCKET, key, len(findings))
+
+    if SNS_TOPIC_ARN:
+        msg = {
+            "summary": f"CC7.2 Detector found {len(findings)} open-to-world SG rule(s)",
+            "bucket": BUCKET,
+            "key": key,
+            "region": region,
+            "accountId": account_id,
+        }
+        try:
+            sns.publish(
+                TopicArn=SNS_TOPIC_ARN,
+                Message=orjson.dumps(msg).decode(),
+                Subject=f"[SOC2 CC7.2] Detector findings: {len(findings)} rule(s)"
+            )
+        except Exception as e:
+            logger.exception("Failed to publish SNS: %s", e)
+
+        if PER_FINDING_ALERTS:
+            try:
+                _publish_findings(findings)
+            except Exception as e:
+                logger.exception("Failed to publish per-finding SNS alerts: %s", e)
+
+    return {"status": "OK", "s3Key": key, "count": len(findings)}
@@ -1,202 +1,293 @@
-# remediator.py
-"""
-SOC2 CC7.2 Remediator Lambda
-Handler: remediator.lambda_handler
-
-Environment variables:
-- BUCKET (required): S3 bucket name used by detector & remediator
-- FINDINGS_PREFIX (optional): prefix detector writes findings to (default "audit_reports/findings")
-- REMEDIATIONS_PREFIX (optional): prefix to write remediation reports (default "audit_reports/remediations")
-- SNS_TOPIC_ARN (optional): ARN of SNS topic to notify
-- REMEDIATE_PORTS (optional): "ALL" or comma-separated ports to auto-remediate (default "22,3389")
-- DRY_RUN (optional): "true" or "false" - if true, performs no mutations (default "false")
-"""
-
-import os
-import json
-import uuid
-import boto3
-import datetime
-import logging
-from typing import Optional, Set
-from urllib.parse import unquote_plus
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-ec2 = boto3.client("ec2")
-s3 = boto3.client("s3")
-sns = boto3.client("sns")
-
-BUCKET = os.environ["BUCKET"]
-FINDINGS_PREFIX = os.environ.get("FINDINGS_PREFIX", "audit_reports/findings")
-REMEDIATIONS_PREFIX = os.environ.get("REMEDIATIONS_PREFIX", "audit_reports/remediations")
-SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
-REMEDIATE_PORTS = os.environ.get("REMEDIATE_PORTS", "22,3389")  # "ALL" or csv
-DRY_RUN = os.environ.get("DRY_RUN", "false").lower() == "true"
-
-def _parse_ports(raw: str) -> Optional[Set[int]]:
-    raw = (raw or "").strip().upper()
-    if raw in ("", "ALL"):
-        return None
-    out = set()
-    for p in raw.split(","):
-        p = p.strip()
-        if not p:
-            continue
-        try:
-            out.add(int(p))
-        except ValueError:
-            logger.warning("Ignoring invalid REMEDIATE_PORTS entry: %r", p)
-    return out
-
-REMEDIATE_PORT_SET = _parse_ports(REMEDIATE_PORTS)
-
-def _now_iso() -> str:
-    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
-
-def _world(f):
-    return f.get("cidr") == "0.0.0.0/0" or f.get("ipv6Cidr") == "::/0"
-
-def _ports_match(f) -> bool:
-    """Return True if this finding should be auto-remediated according to REMEDIATE_PORTS."""
-    if REMEDIATE_PORT_SET is None:
-        return True
-    fp = f.get("fromPort")
-    tp = f.get("toPort")
-    proto = (f.get("ipProtocol") or "").lower()
-    if proto in ("tcp", "udp") and isinstance(fp, int) and isinstance(tp, int):
-        for p in REMEDIATE_PORT_SET:
-            if fp <= p <= tp:
-                return True
-    return False
-
-def _build_ip_permissions(f):
-    ip_permissions = {
-        "IpProtocol": f.get("ipProtocol") if f.get("ipProtocol") is not None else "-1"
-    }
-    if f.get("fromPort") is not None:
-        ip_permissions["FromPort"] = int(f["fromPort"])
-    if f.get("toPort") is not None:
-        ip_permissions["ToPort"] = int(f["toPort"])
-
-    ipv4 = []
-    ipv6 = []
-    if f.get("cidr"):
-        ipv4.append({"CidrIp": f["cidr"]})
-    if f.get("ipv6Cidr"):
-        ipv6.append({"CidrIpv6": f["ipv6Cidr"]})
-    if ipv4:
-        ip_permissions["IpRanges"] = ipv4
-    if ipv6:
-        ip_permissions["Ipv6Ranges"] = ipv6
-    return [ip_permissions]
-
-def lambda_handler(event, context):
-    # EventBridge "Object Created" -> event['detail']['bucket']['name'] and event['detail']['object']['key']
-    try:
-        detail = event.get("detail") or {}
-        bucket = (detail.get("bucket") or {}).get("name")
-        key = (detail.get("object") or {}).get("key")
-        if key:
-            key = unquote_plus(key)
-    except Exception:
-        logger.exception("Unexpected event format")
-        return {"status": "ERROR", "message": "Bad event format"}
-
-    if not bucket or not key:
-        logger.error("Missing bucket/key in event: %s", json.dumps(event))
-        return {"status": "ERROR", "message": "Missing bucket/key"}
-
-    if not key.startswith(FINDINGS_PREFIX + "/"):
-        logger.info("Ignoring object outside findings prefix: s3://%s/%s", bucket, key)
-        return {"status": "IGNORED"}
-
-    logger.info("Processing findings: s3://%s/%s", bucket, key)
-    obj = s3.get_object(Bucket=bucket, Key=key)
-    payload = json.loads(obj["Body"].read())
-
-    results = []
-    attempted = 0
-    revoked = 0
-    skipped = 0
-    failed = 0
-
-    for f in payload.get("findings", []):
-        if not f.get("remediationEligible", True):
-            skipped += 1
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "remediationEligible=false"})
-            continue
-        if f.get("direction") != "ingress" or not _world(f):
-            skipped += 1
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "not ingress or not world-open"})
-            continue
-        if not _ports_match(f):
-            skipped += 1
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "port not in REMEDIATE_PORTS"})
-            continue
-
-        attempted += 1
-        if DRY_RUN:
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "DRY_RUN"})
-            continue
-
-        try:
-            ip_permissions = _build_ip_permissions(f)
-            ec2.revoke_security_group_ingress(
-                GroupId=f["groupId"],
-                IpPermissions=ip_permissions
-            )
-            revoked += 1
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "REVOKED"})
-        except Exception as e:
-            failed += 1
-            logger.exception("Failed to revoke SG rule for %s", f.get("groupId"))
-            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "FAILED", "error": str(e)})
-
-    summary = {
-        "totalFindingsInFile": len(payload.get("findings", [])),
-        "attempted": attempted,
-        "revoked": revoked,
-        "failed": failed,
-        "skipped": skipped,
-        "dryRun": DRY_RUN,
-    }
-
-    ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    rem_key = f"{REMEDIATIONS_PREFIX}/cc72-remediation-{ts}-{uuid.uuid4().hex[:8]}.json"
-    report = {
-        "schemaVersion": "2025-09-10",
-        "control": "SOC2-CC7.2",
-        "processor": "cc72-remediator-lambda",
-        "sourceFindingsKey": key,
-        "remediatedAt": _now_iso(),
-        "summary": summary,
-        "results": results,
-    }
-
-    s3.put_object(
-        Bucket=BUCKET,
-        Key=rem_key,
-        Body=json.dumps(report, indent=2).encode("utf-8"),
-        ContentType="application/json"
-    )
-    logger.info("Wrote remediation report to s3://%s/%s", BUCKET, rem_key)
-
-    if SNS_TOPIC_ARN:
-        msg = {
-            "summary": summary,
-            "bucket": BUCKET,
-            "remediationKey": rem_key,
-            "sourceFindingsKey": key,
-        }
-        try:
-            sns.publish(
-                TopicArn=SNS_TOPIC_ARN,
-                Message=json.dumps(msg),
-                Subject=f"[SOC2 CC7.2] Remediation: revoked={revoked}, failed={failed}, skipped={skipped}, dryRun={DRY_RUN}"
-            )
-        except Exception as e:
-            logger.exception("Failed to publish SNS: %s", e)
-
-    return {"status": "OK", "remediationReportKey": rem_key, "summary": summary}
+# remediator.py
+"""
+SOC2 CC7.2 Remediator Lambda
+Handler: remediator.lambda_handler
+Package soc2_aws.py alongside.
+
+Environment variables:
+- BUCKET (required): S3 bucket name used by detector & remediator
+- FINDINGS_PREFIX (optional): prefix detector writes findings to (default "audit_reports/findings")
+- REMEDIATIONS_PREFIX (optional): prefix to write remediation reports (default "audit_reports/remediations")
+- SNS_TOPIC_ARN (optional): ARN of SNS topic to notify
+- REMEDIATE_PORTS (optional): "ALL" or comma-separated ports to auto-remediate (default "22,3389")
+- DRY_RUN (optional): "true" or "false" - if true, performs no mutations (default "false")
+- WARM_INIT (optional): "1" to open client connections in the background during cold start (default off)
+"""
+
+import os
+import gzip
+import orjson
+import uuid
+import boto3
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional, Set
+from urllib.parse import unquote_plus
+from soc2_aws import client_config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CLIENT_CONFIG = client_config()
+
+ec2 = boto3.client("ec2", config=CLIENT_CONFIG)
+# Findings carry the region they were detected in; clients for other regions are created on first use
+_ec2_by_region = {ec2.meta.region_name: ec2}
+s3 = boto3.client("s3", config=CLIENT_CONFIG)
+sns = boto3.client("sns", config=CLIENT_CONFIG)
+
+BUCKET = os.environ["BUCKET"]
+FINDINGS_PREFIX = os.environ.get("FINDINGS_PREFIX", "audit_reports/findings")
+REMEDIATIONS_PREFIX = os.environ.get("REMEDIATIONS_PREFIX", "audit_reports/remediations")
+SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
+REMEDIATE_PORTS = os.environ.get("REMEDIATE_PORTS", "22,3389")  # "ALL" or csv
+DRY_RUN = os.environ.get("DRY_RUN", "false").lower() == "true"
+
+def _warm_clients():
+    """Resolve credentials and open TLS connections before the first real call; failures are harmless."""
+    for call in (lambda: ec2.describe_regions(RegionNames=[ec2.meta.region_name]),
+                 lambda: s3.head_bucket(Bucket=BUCKET)):
+        try:
+            call()
+        except Exception as e:
+            logger.debug("Warm-up call failed: %s", e)
+
+if os.environ.get("WARM_INIT") == "1":
+    threading.Thread(target=_warm_clients, daemon=True).start()
+
+def _parse_ports(raw: str) -> Optional[Set[int]]:
+    raw = (raw or "").strip().upper()
+    if raw in ("", "ALL"):
+        return None
+    out = set()
+    for p in raw.split(","):
+        p = p.strip()
+        if not p:
+            continue
+        try:
+            out.add(int(p))
+        except ValueError:
+            logger.warning("Ignoring invalid REMEDIATE_PORTS entry: %r", p)
+    return out
+
+REMEDIATE_PORT_SET = _parse_ports(REMEDIATE_PORTS)
+
+_WORLD_CIDRS = frozenset({"0.0.0.0/0", "::/0"})
+
+def _world(f):
+    return f.get("cidr") in _WORLD_CIDRS or f.get("ipv6Cidr") in _WORLD_CIDRS
+
+def _ports_match(f) -> bool:
+    """Return True if this finding should be auto-remediated according to REMEDIATE_PORTS."""
+    if REMEDIATE_PORT_SET is None:
+        return True
+    fp = f.get("fromPort")
+    tp = f.get("toPort")
+    proto = (f.get("ipProtocol") or "").lower()
+    if proto in ("tcp", "udp") and isinstance(fp, int) and isinstance(tp, int):
+        for p in REMEDIATE_PORT_SET:
+            if fp <= p <= tp:
+                return True
+    return False
+
+def _build_ip_permissions(f):
+    ip_permissions = {
+        "IpProtocol": f.get("ipProtocol") if f.get("ipProtocol") is not None else "-1"
+    }
+    if f.get("fromPort") is not None:
+        ip_permissions["FromPort"] = int(f["fromPort"])
+    if f.get("toPort") is not None:
+        ip_permissions["ToPort"] = int(f["toPort"])
+
+    ipv4 = []
+    ipv6 = []
+    if f.get("cidr"):
+        ipv4.append({"CidrIp": f["cidr"]})
+    if f.get("ipv6Cidr"):
+        ipv6.append({"CidrIpv6": f["ipv6Cidr"]})
+    if ipv4:
+        ip_permissions["IpRanges"] = ipv4
+    if ipv6:
+        ip_permissions["Ipv6Ranges"] = ipv6
+    return [ip_permissions]
+
+def _mark_failed(members, error):
+    for _, res in members:
+        res["action"] = "FAILED"
+        res["error"] = str(error)
+
+def _ec2_for(region: Optional[str]):
+    if not region:
+        return ec2
+    if region not in _ec2_by_region:
+        _ec2_by_region[region] = boto3.client("ec2", region_name=region, config=CLIENT_CONFIG)
+    return _ec2_by_region[region]
+
+def _perm_atoms(perm) -> set:
+    """(protocol, fromPort, toPort, cidr) tuples of one IpPermission, comparable across request and response."""
+    proto = str(perm.get("IpProtocol", "-1")).lower()
+    ports = (None, None) if proto in ("-1", "all") else (perm.get("FromPort"), perm.get("ToPort"))
+    cidrs = [r.get("CidrIp") for r in perm.get("IpRanges", [])] + [r.get("CidrIpv6") for r in perm.get("Ipv6Ranges", [])]
+    return {(proto, *ports, c) for c in cidrs}
+
+def _apply_revoke_response(resp, members, perms) -> None:
+    """Mark members from a successful revoke call. AWS does not raise for rules it did not find;
+    it lists them in UnknownIpPermissions and returns Return=False, so those must not count as revoked."""
+    unknown = set().union(*(_perm_atoms(p) for p in resp.get("UnknownIpPermissions", [])))
+    if resp.get("Return") is False and not unknown:
+        _mark_failed(members, "RevokeSecurityGroupIngress returned false")
+        return
+    for (_, res), perm in zip(members, perms):
+        if _perm_atoms(perm) & unknown:
+            res["action"] = "NOT_FOUND"
+            res["error"] = "Rule not present on the security group"
+        else:
+            res["action"] = "REVOKED"
+
+def _revoke_group(region: Optional[str], group_id: str, members: list) -> None:
+    """Revoke every eligible rule of one security group in a single API call.
+    members is a list of (finding, result) pairs; results are updated in place.
+    If the batch is rejected because a rule no longer exists, retry rule by rule
+    so only the missing one fails."""
+    perms = [_build_ip_permissions(f)[0] for f, _ in members]
+    try:
+        resp = _ec2_for(region).revoke_security_group_ingress(GroupId=group_id, IpPermissions=perms)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "InvalidPermission.NotFound" or len(members) == 1:
+            logger.exception("Failed to revoke SG rules for %s", group_id)
+            _mark_failed(members, e)
+            return
+        logger.warning("Batch revoke for %s hit a missing rule; retrying per permission", group_id)
+        for member, perm in zip(members, perms):
+            try:
+                resp = _ec2_for(region).revoke_security_group_ingress(GroupId=group_id, IpPermissions=[perm])
+                _apply_revoke_response(resp, [member], [perm])
+            except Exception as err:
+                logger.exception("Failed to revoke SG rule for %s", group_id)
+                _mark_failed([member], err)
+        return
+    except Exception as e:
+        logger.exception("Failed to revoke SG rules for %s", group_id)
+        _mark_failed(members, e)
+        return
+    _apply_revoke_response(resp, members, perms)
+
+def _stream_findings(body):
+    """Yield findings from a detector NDJSON+gzip object without loading it whole.
+    The first line is the run header and is skipped."""
+    with gzip.GzipFile(fileobj=body) as gz:
+        next(gz, None)
+        for line in gz:
+            if line.strip():
+                yield orjson.loads(line)
+
+def lambda_handler(event, context):
+    # EventBridge "Object Created" -> event['detail']['bucket']['name'] and event['detail']['object']['key']
+    try:
+        detail = event.get("detail") or {}
+        bucket = (detail.get("bucket") or {}).get("name")
+        key = (detail.get("object") or {}).get("key")
+        if key:
+            key = unquote_plus(key)
+    except Exception:
+        logger.exception("Unexpected event format")
+        return {"status": "ERROR", "message": "Bad event format"}
+
+    if not bucket or not key:
+        logger.error("Missing bucket/key in event: %s", orjson.dumps(event).decode())
+        return {"status": "ERROR", "message": "Missing bucket/key"}
+
+    if not key.startswith(FINDINGS_PREFIX + "/"):
+        logger.info("Ignoring object outside findings prefix: s3://%s/%s", bucket, key)
+        return {"status": "IGNORED"}
+
+    logger.info("Processing findings: s3://%s/%s", bucket, key)
+    obj = s3.get_object(Bucket=bucket, Key=key)
+
+    results = []
+    total = 0
+    attempted = 0
+    skipped = 0
+    by_group = defaultdict(list)
+
+    for f in _stream_findings(obj["Body"]):
+        total += 1
+        if not f.get("remediationEligible", True):
+            skipped += 1
+            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "remediationEligible=false"})
+            continue
+        if f.get("direction") != "ingress" or not _world(f):
+            skipped += 1
+            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "not ingress or not world-open"})
+            continue
+        if not _ports_match(f):
+            skipped += 1
+            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "SKIPPED", "reason": "port not in REMEDIATE_PORTS"})
+            continue
+
+        attempted += 1
+        if DRY_RUN:
+            results.append({"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": "DRY_RUN"})
+            continue
+
+        # Placeholder keeps report order; filled in once the group's batch has run
+        res = {"findingId": f.get("findingId"), "groupId": f.get("groupId"), "action": None}
+        results.append(res)
+        by_group[(f.get("region"), f.get("groupId"))].append((f, res))
+
+    # One revoke call per security group instead of one per finding
+    for (region, group_id), members in by_group.items():
+        _revoke_group(region, group_id, members)
+    revoked = sum(1 for members in by_group.values() for _, res in members if res["action"] == "REVOKED")
+    failed = sum(len(members) for members in by_group.values()) - revoked
+
+    summary = {
+        "totalFindingsInFile": total,
+        "attempted": attempted,
+        "revoked": revoked,
+        "failed": failed,
+        "skipped": skipped,
+        "dryRun": DRY_RUN,
+    }
+
+    run_dt = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    ts = run_dt.strftime("%Y%m%dT%H%M%SZ")
+    rem_key = f"{REMEDIATIONS_PREFIX}/cc72-remediation-{ts}-{uuid.uuid4().hex[:8]}.json"
+    report = {
+        "schemaVersion": "2025-09-10",
+        "control": "SOC2-CC7.2",
+        "processor": "cc72-remediator-lambda",
+        "sourceFindingsKey": key,
+        "remediatedAt": run_dt.isoformat(),
+        "summary": summary,
+        "results": results,
+    }
+
+    s3.put_object(
+        Bucket=BUCKET,
+        Key=rem_key,
+        Body=orjson.dumps(report, option=orjson.OPT_INDENT_2),
+        ContentType="application/json"
+    )
+    logger.info("Wrote remediation report to s3://%s/%s", BUCKET, rem_key)
+
+    if SNS_TOPIC_ARN:
+        msg = {
+            "summary": summary,
+            "bucket": BUCKET,
+            "remediationKey": rem_key,
+            "sourceFindingsKey": key,
+        }
+        try:
+            sns.publish(
+                TopicArn=SNS_TOPIC_ARN,
+                Message=orjson.dumps(msg).decode(),
+                Subject=f"[SOC2 CC7.2] Remediation: revoked={revoked}, failed={failed}, skipped={skipped}, dryRun={DRY_RUN}"
+            )
+        except Exception as e:
+            logger.exception("Failed to publish SNS: %s", e)
+
+    return {"status": "OK", "remediationReportKey": rem_key, "summary": summary}
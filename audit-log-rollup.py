@@ -0,0 +1,78 @@
+# audit-log-rollup.py
+"""
+SOC2 Audit Log Rollup Lambda
+Handler: audit-log-rollup.lambda_handler
+
+Concatenates one day's audit findings per control family into a single
+JSON-Lines object so the dashboard reads one object per family/day instead
+of one object per finding. Schedule it nightly via EventBridge. Package
+soc2_audit_logs.py and soc2_aws.py alongside.
+
+Environment variables:
+- BUCKET (required): central audit bucket
+- AUDIT_PREFIX (optional): prefix the controls write under (default "audit_reports/")
+- ROLLUP_PREFIX (optional): prefix rollups are written to (default "audit_reports/_rollup/")
+
+Event (optional):
+- {"date": "YYYYMMDD"} - day to roll up (default: yesterday, UTC)
+"""
+
+import os
+import orjson
+import boto3
+import datetime
+import logging
+from collections import defaultdict
+from soc2_aws import client_config
+from soc2_audit_logs import AUDIT_LOG_SUFFIXES, decode_log
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CLIENT_CONFIG = client_config()
+
+s3 = boto3.client("s3", config=CLIENT_CONFIG)
+
+BUCKET = os.environ["BUCKET"]
+AUDIT_PREFIX = os.environ.get("AUDIT_PREFIX", "audit_reports/")
+ROLLUP_PREFIX = os.environ.get("ROLLUP_PREFIX", "audit_reports/_rollup/")
+
+def _yesterday() -> str:
+    return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)).strftime("%Y%m%d")
+
+def _read_log(key: str):
+    return decode_log(key, s3.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+
+def lambda_handler(event, context):
+    day = (event or {}).get("date") or _yesterday()
+    logger.info("Rolling up audit logs | bucket=%s day=%s", BUCKET, day)
+
+    # family -> keys last modified on `day`
+    by_family = defaultdict(list)
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET, Prefix=AUDIT_PREFIX):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if key.startswith(ROLLUP_PREFIX) or not key.endswith(AUDIT_LOG_SUFFIXES):
+                continue
+            if obj["LastModified"].strftime("%Y%m%d") != day:
+                continue
+            parts = key[len(AUDIT_PREFIX):].split("/", 1)
+            if len(parts) < 2:
+                continue
+            by_family[parts[0]].append(key)
+
+    rollups = []
+    for family, keys in by_family.items():
+        lines = [orjson.dumps({"s3_key": key, "log": _read_log(key)}, option=orjson.OPT_APPEND_NEWLINE) for key in sorted(keys)]
+        rollup_key = f"{ROLLUP_PREFIX}{family}/{day}.jsonl"
+        s3.put_object(
+            Bucket=BUCKET,
+            Key=rollup_key,
+            Body=b"".join(lines),
+            ContentType="application/x-ndjson"
+        )
+        logger.info("Wrote rollup s3://%s/%s (count=%d)", BUCKET, rollup_key, len(keys))
+        rollups.append({"key": rollup_key, "count": len(keys)})
+
+    return {"status": "OK", "date": day, "rollups": rollups}
@@ -1,90 +1,125 @@
-import boto3, json, os
-from datetime import datetime
-
-iam = boto3.client('iam')
-sns = boto3.client('sns')
-s3 = boto3.client('s3')
-
-SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
-GROUP_NAME = os.environ['GROUP_NAME']
-
-S3_BUCKET = "soc2-audit-logs-central-206299126127"
-S3_PREFIX = "audit_reports/cc6-3/"
-
-def lambda_handler(event, context):
-    response = iam.get_group(GroupName=GROUP_NAME)
-    users = response['Users']
-    violations = []
-
-    for user in users:
-        user_name = user['UserName']
-
-        # ----- Check attached managed policies -----
-        attached_policies = iam.list_attached_user_policies(UserName=user_name)['AttachedPolicies']
-        for policy in attached_policies:
-            policy_details = iam.get_policy(PolicyArn=policy['PolicyArn'])
-            version = iam.get_policy_version(
-                PolicyArn=policy['PolicyArn'],
-                VersionId=policy_details['Policy']['DefaultVersionId']
-            )
-            doc = version['PolicyVersion']['Document']
-            statements = doc['Statement'] if isinstance(doc['Statement'], list) else [doc['Statement']]
-
-            for stmt in statements:
-                actions = stmt.get('Action', [])
-                if isinstance(actions, str):
-                    actions = [actions]
-                for act in actions:
-                    if act in ["iam:*", "ec2:*", "s3:*", "*"] or "PowerUserAccess" in policy['PolicyName']:
-                        violations.append({
-                            'User': user_name,
-                            'Policy': policy['PolicyName'],
-                            'Action': act,
-                            'DetectedAt': datetime.utcnow().isoformat()
-                        })
-
-        # ----- Check inline policies -----
-        inline_policy_names = iam.list_user_policies(UserName=user_name)['PolicyNames']
-        for policy_name in inline_policy_names:
-            inline_policy = iam.get_user_policy(UserName=user_name, PolicyName=policy_name)
-            statements = inline_policy['PolicyDocument']['Statement']
-            if not isinstance(statements, list):
-                statements = [statements]
-
-            for stmt in statements:
-                actions = stmt.get('Action', [])
-                if isinstance(actions, str):
-                    actions = [actions]
-                for act in actions:
-                    if act in ["iam:*", "ec2:*", "s3:*", "*"]:
-                        violations.append({
-                            'User': user_name,
-                            'Policy': f"{policy_name} (inline)",
-                            'Action': act,
-                            'DetectedAt': datetime.utcnow().isoformat()
-                        })
-
-    # ----- Alert and log violations -----
-    if violations:
-        message = f"Least Privilege Violations Detected:\n" + json.dumps(violations, indent=2)
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject="SOC2 CC6.3 Violation Detected",
-            Message=message
-        )
-
-        timestamp = datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%SZ')
-        
-        # Save pretty-printed JSON array instead of NDJSON
-        report_key = f"{S3_PREFIX}report-{timestamp}.json"
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key=report_key,
-            Body=json.dumps(violations, indent=4),  # <-- pretty print
-            ContentType='application/json'
-        )
-
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'violations_found': len(violations)})
-    }
+import boto3, orjson, os, hashlib
+from soc2_aws import client_config, publish_batch
+from datetime import datetime, timezone
+
+CLIENT_CONFIG = client_config()
+
+iam = boto3.client('iam', config=CLIENT_CONFIG)
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+
+SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+GROUP_NAME = os.environ['GROUP_NAME']
+
+S3_BUCKET = "soc2-audit-logs-central-206299126127"
+S3_PREFIX = "audit_reports/cc6-3/"
+WILDCARD_ACTIONS = frozenset({"iam:*", "ec2:*", "s3:*", "*"})
+# "1" also sends one SNS message per violation (batched 10 per call) alongside the summary
+PER_FINDING_ALERTS = os.environ.get('PER_FINDING_ALERTS') == '1'
+
+def publish_findings(violations):
+    """Publish one SNS message per violation, up to 10 per PublishBatch call."""
+    publish_batch(sns, SNS_TOPIC_ARN, (
+        {'Subject': "SOC2 CC6.3 Violation Detected", 'Message': orjson.dumps(v).decode()}
+        for v in violations
+    ))
+
+def load_authorization_details():
+    """Members of GROUP_NAME plus default-version managed policy documents, from one paginated sweep.
+
+    Replaces the per-user list/get calls: users come back with their attached and inline
+    policies, and the Policies list carries every managed policy document they reference."""
+    users = []
+    documents = {}
+    paginator = iam.get_paginator('get_account_authorization_details')
+    for page in paginator.paginate(Filter=['User', 'LocalManagedPolicy', 'AWSManagedPolicy']):
+        users.extend(u for u in page.get('UserDetailList', []) if GROUP_NAME in u.get('GroupList', []))
+        for policy in page.get('Policies', []):
+            for version in policy.get('PolicyVersionList', []):
+                if version.get('IsDefaultVersion'):
+                    documents[policy['Arn']] = version['Document']
+    return users, documents
+
+def _statements(doc):
+    stmts = doc['Statement']
+    return stmts if isinstance(stmts, list) else [stmts]
+
+def _actions(stmt, key='Action'):
+    a = stmt.get(key, ())
+    return (a,) if isinstance(a, str) else a
+
+def statement_violation(user_name, policy_name, stmt, detected_at, flag_all=False):
+    """One violation record listing every offending action in a statement, or None.
+
+    flag_all treats every action as offending (e.g. PowerUserAccess). An Allow with
+    NotAction grants everything except the listed actions, so it is always reported."""
+    actions = _actions(stmt)
+    bad_actions = list(actions) if flag_all else [a for a in actions if a in WILDCARD_ACTIONS]
+    not_actions = list(_actions(stmt, 'NotAction')) if stmt.get('Effect') == 'Allow' else []
+    if not bad_actions and not not_actions:
+        return None
+
+    violation = {'User': user_name, 'Policy': policy_name, 'Actions': bad_actions}
+    if not_actions:
+        violation['NotActions'] = not_actions
+    violation['DetectedAt'] = detected_at
+    return violation
+
+def inspect_user(user, documents, detected_at):
+    """Return least-privilege violations for one IAM user, stamped with the scan time."""
+    user_name = user['UserName']
+    violations = []
+
+    # ----- Check attached managed policies -----
+    for policy in user.get('AttachedManagedPolicies', []):
+        power_user = "PowerUserAccess" in policy['PolicyName']
+        for stmt in _statements(documents[policy['PolicyArn']]):
+            violation = statement_violation(user_name, policy['PolicyName'], stmt, detected_at, flag_all=power_user)
+            if violation:
+                violations.append(violation)
+
+    # ----- Check inline policies -----
+    for inline_policy in user.get('UserPolicyList', []):
+        policy_name = f"{inline_policy['PolicyName']} (inline)"
+        for stmt in _statements(inline_policy['PolicyDocument']):
+            violation = statement_violation(user_name, policy_name, stmt, detected_at)
+            if violation:
+                violations.append(violation)
+
+    return violations
+
+def lambda_handler(event, context):
+    users, documents = load_authorization_details()
+
+    # One timestamp per run, shared by every violation and the report key
+    run_dt = datetime.now(timezone.utc).replace(microsecond=0)
+    detected_at = run_dt.isoformat()
+    violations = [v for user in users for v in inspect_user(user, documents, detected_at)]
+
+    # ----- Alert and log violations -----
+    if violations:
+        message = f"Least Privilege Violations Detected:\n" + orjson.dumps(violations, option=orjson.OPT_INDENT_2).decode()
+        sns.publish(
+            TopicArn=SNS_TOPIC_ARN,
+            Subject="SOC2 CC6.3 Violation Detected",
+            Message=message
+        )
+        if PER_FINDING_ALERTS:
+            publish_findings(violations)
+
+        timestamp = run_dt.strftime('%Y-%m-%dT%H-%M-%SZ')
+        
+        # Save pretty-printed JSON array instead of NDJSON; the hash shard spreads PUTs across S3 key partitions
+        shard = hashlib.blake2b(timestamp.encode(), digest_size=1).hexdigest()
+        report_key = f"{S3_PREFIX}shard={shard}/report-{timestamp}.json"
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=report_key,
+            Body=orjson.dumps(violations, option=orjson.OPT_INDENT_2),  # <-- pretty print
+            ContentType='application/json'
+        )
+
+    return {
+        'statusCode': 200,
+        'body': orjson.dumps({'violations_found': len(violations)}).decode()
+    }
@@ -1,54 +1,69 @@
-import json
-import boto3
-import os
-from datetime import datetime
-
-sns = boto3.client('sns')
-s3 = boto3.client('s3')
-
-# Fixed bucket for SOC 2 audit logs
-AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
-# SNS topic from environment variable
-SNS_TOPIC = os.environ['SNS_TOPIC']
-
-def lambda_handler(event, context):
-    detail = event.get("detail", {})
-
-    if detail.get("eventName") == "RevokeSecurityGroupEgress":
-        # Build alert message
-        alert_msg = f"""
-🚨 SOC 2 CC6.6 ALERT: RevokeSecurityGroupEgress detected
-
-Time: {detail.get('eventTime')}
-User: {detail.get('userIdentity', {}).get('arn')}
-IP: {detail.get('sourceIPAddress')}
-Group ID: {detail.get('requestParameters', {}).get('groupId')}
-"""
-
-        # Send SNS alert
-        sns.publish(
-            TopicArn=SNS_TOPIC,
-            Subject="CC6.6 - SG Egress Revoked",
-            Message=alert_msg.strip()
-        )
-
-        # ✅ Force logs to go into audit_reports/cc6-6/
-        filename = (
-            f"audit_reports/cc6-6/"
-            f"revoke-egress-{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%SZ')}.json"
-        )
-
-        # Save pretty-printed JSON audit report
-        s3.put_object(
-            Bucket=AUDIT_BUCKET,
-            Key=filename,
-            Body=json.dumps(event, indent=4),  # pretty JSON
-            ContentType='application/json'
-        )
-
-        return {
-            "status": "OK",
-            "message": f"Audit log saved to s3://{AUDIT_BUCKET}/{filename}"
-        }
-
-    return {"status": "IGNORED", "reason": "Not a RevokeSecurityGroupEgress event"}
+import orjson
+import boto3
+import os
+import gzip
+from datetime import datetime, timezone
+from soc2_aws import client_config, dedup_attributes, dedup_id, idempotent
+
+CLIENT_CONFIG = client_config()
+
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+
+# Fixed bucket for SOC 2 audit logs
+AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
+# ✅ Force logs to go into audit_reports/cc6-6/
+AUDIT_PREFIX = "audit_reports/cc6-6/revoke-egress-"
+# SNS topic from environment variable
+SNS_TOPIC = os.environ['SNS_TOPIC']
+
+EVENT_NAME = "RevokeSecurityGroupEgress"
+
+def lambda_handler(event, context):
+    detail = event.get("detail", {})
+
+    # Bail out before any formatting or I/O on the common non-matching event
+    if detail.get("eventName") != EVENT_NAME:
+        return {"status": "IGNORED", "reason": f"Not a {EVENT_NAME} event"}
+
+    ts = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%SZ')
+    dedup = dedup_id(event)
+    # Key from the event's own time and id, so a redelivered event overwrites the same object
+    stamp = event.get('time', '').replace(':', '-') or ts
+
+    # Build alert message
+    alert_msg = f"""
+🚨 SOC 2 CC6.6 ALERT: RevokeSecurityGroupEgress detected
+
+Time: {detail.get('eventTime')}
+User: {detail.get('userIdentity', {}).get('arn')}
+IP: {detail.get('sourceIPAddress')}
+Group ID: {detail.get('requestParameters', {}).get('groupId')}
+"""
+
+    # Send SNS alert
+    sns.publish(
+        TopicArn=SNS_TOPIC,
+        Subject="CC6.6 - SG Egress Revoked",
+        Message=alert_msg.strip(),
+        **dedup_attributes(dedup, SNS_TOPIC)
+    )
+
+    filename = f"{AUDIT_PREFIX}{stamp}-{dedup}.json"
+
+    # Save compact JSON audit report; pretty-print at read time if needed
+    s3.put_object(
+        Bucket=AUDIT_BUCKET,
+        Key=filename,
+        Body=gzip.compress(orjson.dumps(event), compresslevel=1),
+        ContentEncoding='gzip',
+        ContentType='application/json'
+    )
+
+    return {
+        "status": "OK",
+        "message": f"Audit log saved to s3://{AUDIT_BUCKET}/{filename}"
+    }
+
+# Powertools idempotency when IDEMPOTENCY_TABLE is set; unchanged otherwise
+lambda_handler = idempotent(lambda_handler)
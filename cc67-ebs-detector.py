@@ -1,79 +1,97 @@
-import boto3, os, json
-from datetime import datetime, timezone, timedelta
-
-# AWS Clients
-ec2 = boto3.client('ec2')
-sns = boto3.client('sns')
-s3 = boto3.client('s3')
-
-# Environment variables
-SNS_TOPIC = os.environ['SNS_TOPIC']   # should be set in Lambda configuration
-AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
-
-# Settings
-THRESHOLD_DAYS = 0
-DELETE_ENABLED = True  # change to False to disable deletion but keep logging
-
-def lambda_handler(event, context):
-    threshold_date = datetime.now(timezone.utc) - timedelta(days=THRESHOLD_DAYS)
-    deleted_volumes = []
-
-    # Get all unattached (available) volumes
-    response = ec2.describe_volumes(Filters=[{"Name": "status", "Values": ["available"]}])
-
-    for vol in response['Volumes']:
-        vol_id = vol["VolumeId"]
-        create_time = vol["CreateTime"]
-        eligible = create_time < threshold_date  # check age
-
-        # Prepare log entry
-        entry = {
-            "VolumeId": vol_id,
-            "Size": vol["Size"],
-            "AZ": vol["AvailabilityZone"],
-            "CreateTime": create_time.isoformat(),
-            "Tags": vol.get("Tags", []),
-            "EligibleForDeletion": eligible
-        }
-
-        if eligible:
-            try:
-                if DELETE_ENABLED:
-                    ec2.delete_volume(VolumeId=vol_id)
-                    entry["Action"] = "Deleted"
-                else:
-                    entry["Action"] = "WouldDelete"
-            except Exception as e:
-                entry["Action"] = "Error"
-                entry["Error"] = str(e)
-
-        else:
-            entry["Action"] = "Skipped"
-
-        deleted_volumes.append(entry)
-
-    # If we did something, send notification and save logs
-    if deleted_volumes:
-        message = (
-            f"🧹 SOC 2 CC6.7: Processed {len(deleted_volumes)} unattached EBS volumes "
-            f"(older than {THRESHOLD_DAYS} days are deleted):\n\n"
-            + json.dumps(deleted_volumes, indent=2)
-        )
-
-        # SNS notification
-        sns.publish(
-            TopicArn=SNS_TOPIC,
-            Subject=f"SOC2 CC6.7: {len(deleted_volumes)} EBS Volumes Processed",
-            Message=message
-        )
-
-        # Save logs in S3
-        filename = f"audit_reports/cc6.7-ebs-deleted/deleted-{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%SZ')}.json"
-        s3.put_object(
-            Bucket=AUDIT_BUCKET,
-            Key=filename,
-            Body=json.dumps(deleted_volumes, indent=2),
-            ContentType='application/json'
-        )
-
-    return {"processed_count": len(deleted_volumes)}
+import boto3, os, orjson, gzip
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from soc2_aws import client_config, dedup_attributes, dedup_id, publish_batch
+
+DELETE_WORKERS = 16    # concurrent delete_volume calls on the shared EC2 client
+CLIENT_CONFIG = client_config()
+
+# AWS Clients
+ec2 = boto3.client('ec2', config=client_config(max_pool_connections=DELETE_WORKERS))
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+
+# Environment variables
+SNS_TOPIC = os.environ['SNS_TOPIC']   # should be set in Lambda configuration
+AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
+
+# Settings
+THRESHOLD_DAYS = 0
+DELETE_ENABLED = True  # change to False to disable deletion but keep logging
+
+def lambda_handler(event, context):
+    now = datetime.now(timezone.utc)
+    ts = now.strftime('%Y-%m-%dT%H-%M-%SZ')
+    dedup = dedup_id(event)
+    threshold_date = now - timedelta(days=THRESHOLD_DAYS)
+    deleted_volumes = []
+    to_delete = {}  # vol_id -> log entry, filled in once the delete returns
+
+    # Get all unattached (available) volumes, one page at a time
+    paginator = ec2.get_paginator('describe_volumes')
+    pages = paginator.paginate(Filters=[{"Name": "status", "Values": ["available"]}])
+
+    for vol in (vol for page in pages for vol in page['Volumes']):
+        vol_id = vol["VolumeId"]
+        create_time = vol["CreateTime"]
+        eligible = create_time < threshold_date  # check age
+
+        # Prepare log entry
+        entry = {
+            "VolumeId": vol_id,
+            "Size": vol["Size"],
+            "AZ": vol["AvailabilityZone"],
+            "CreateTime": create_time.isoformat(),
+            "Tags": vol.get("Tags", []),
+            "EligibleForDeletion": eligible
+        }
+
+        if not eligible:
+            entry["Action"] = "Skipped"
+        elif DELETE_ENABLED:
+            to_delete[vol_id] = entry
+        else:
+            entry["Action"] = "WouldDelete"
+
+        deleted_volumes.append(entry)
+
+    # Each delete is a blocking round-trip, so overlap them on threads
+    if to_delete:
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as pool:
+            futures = {pool.submit(ec2.delete_volume, VolumeId=vol_id): vol_id for vol_id in to_delete}
+            for future in as_completed(futures):
+                entry = to_delete[futures[future]]
+                try:
+                    future.result()
+                    entry["Action"] = "Deleted"
+                except Exception as e:
+                    entry["Action"] = "Error"
+                    entry["Error"] = str(e)
+
+    # If we did something, send notification and save logs
+    if deleted_volumes:
+        # Serialize each entry once; the SNS messages and the S3 array reuse the same bytes
+        encoded = [orjson.dumps(entry) for entry in deleted_volumes]
+
+        # SNS notification: one message per volume, up to 10 per PublishBatch call
+        publish_batch(sns, SNS_TOPIC, (
+            {
+                "Subject": f"SOC2 CC6.7: EBS Volume {entry['Action']}",
+                "Message": body.decode(),
+                # Keyed by volume: a redelivered run sees a different set, so positions would collide
+                **dedup_attributes(f"{dedup}-{entry['VolumeId']}", SNS_TOPIC)
+            }
+            for entry, body in zip(deleted_volumes, encoded)
+        ))
+
+        # Save logs in S3; the key stays time-based, since a rerun that deletes more volumes is a new report
+        filename = f"audit_reports/cc6.7-ebs-deleted/deleted-{ts}.json"
+        s3.put_object(
+            Bucket=AUDIT_BUCKET,
+            Key=filename,
+            Body=gzip.compress(b"[" + b",".join(encoded) + b"]", compresslevel=1),
+            ContentEncoding='gzip',
+            ContentType='application/json'
+        )
+
+    return {"processed_count": len(deleted_volumes)}
@@ -1,65 +1,92 @@
-import boto3
-import os
-import json
-from datetime import datetime
-
-# Initialize AWS clients
-ec2 = boto3.client('ec2')
-sns = boto3.client('sns')
-s3 = boto3.client('s3')
-
-# Environment variables
-SNS_TOPIC = os.environ['SNS_TOPIC']
-AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
-
-def lambda_handler(event, context):
-    # Get all security groups and ENIs
-    all_sgs = ec2.describe_security_groups()['SecurityGroups']
-    all_eni = ec2.describe_network_interfaces()['NetworkInterfaces']
-
-    # Build set of all attached SGs
-    attached_sgs = set()
-    for eni in all_eni:
-        for sg in eni['Groups']:
-            attached_sgs.add(sg['GroupId'])
-
-    # Find unused security groups (excluding 'default' and SOC2Protected)
-    unused_sgs = []
-    for sg in all_sgs:
-        if (
-            sg['GroupId'] not in attached_sgs and
-            sg['GroupName'] != 'default' and
-            not any(tag.get('Key') == 'SOC2Protected' and tag.get('Value') == 'true' for tag in sg.get('Tags', []))
-        ):
-            unused_sgs.append({
-                "GroupId": sg['GroupId'],
-                "GroupName": sg['GroupName'],
-                "Description": sg['Description'],
-                "VpcId": sg.get('VpcId'),
-                "Tags": sg.get('Tags', [])
-            })
-
-    # If any unused SGs detected, send notification and log to S3
-    if unused_sgs:
-        message = (
-            f"🧹 SOC 2 CC6.7: Detected {len(unused_sgs)} unused Security Groups:\n\n"
-            + json.dumps(unused_sgs, indent=2)
-        )
-
-        # Publish to SNS
-        sns.publish(
-            TopicArn=SNS_TOPIC,
-            Subject="SOC2 CC6.7 - Unused Security Groups",
-            Message=message
-        )
-
-        # Write report to S3 inside audit_reports/cc6.7-sgs/ folder
-        filename = f"audit_reports/cc6.7-sgs/report-{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%SZ')}.json"
-        s3.put_object(
-            Bucket=AUDIT_BUCKET,
-            Key=filename,
-            Body=json.dumps(unused_sgs, indent=2),
-            ContentType='application/json'
-        )
-
-    return {"unused_count": len(unused_sgs)}
+import boto3
+import os
+import gzip
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from soc2_aws import client_config, dedup_attributes, dedup_id, publish_batch
+
+CLIENT_CONFIG = client_config()
+
+# Initialize AWS clients
+ec2 = boto3.client('ec2', config=CLIENT_CONFIG)
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+
+# Environment variables
+SNS_TOPIC = os.environ['SNS_TOPIC']
+AUDIT_BUCKET = "soc2-audit-logs-central-206299126127"
+
+# Security groups carrying this tag are exempt from the report; EC2 filters on it server-side
+PROTECTED_FILTER = [{'Name': 'tag:SOC2Protected', 'Values': ['true']}]
+
+def list_security_groups():
+    paginator = ec2.get_paginator('describe_security_groups')
+    return [sg for page in paginator.paginate() for sg in page['SecurityGroups']]
+
+def attached_group_ids():
+    """Set of SG ids attached to any ENI, built page by page so no ENI list is kept."""
+    pages = ec2.get_paginator('describe_network_interfaces').paginate()
+    return {g['GroupId'] for page in pages for eni in page['NetworkInterfaces'] for g in eni['Groups']}
+
+def protected_group_ids():
+    paginator = ec2.get_paginator('describe_security_groups')
+    return {sg['GroupId'] for page in paginator.paginate(Filters=PROTECTED_FILTER) for sg in page['SecurityGroups']}
+
+def lambda_handler(event, context):
+    ts = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%SZ')
+    dedup = dedup_id(event)
+    # Key from the schedule event's own time and id, so a redelivered run overwrites the same report
+    stamp = event.get('time', '').replace(':', '-') or ts
+
+    # Get all security groups, attached SG ids and protected SG ids; the scans are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        sgs_future = pool.submit(list_security_groups)
+        attached_future = pool.submit(attached_group_ids)
+        protected_future = pool.submit(protected_group_ids)
+        all_sgs = sgs_future.result()
+        attached_sgs = attached_future.result()
+        protected_sgs = protected_future.result()
+
+    # Find unused security groups (excluding 'default' and SOC2Protected)
+    unused_sgs = [
+        {
+            "GroupId": sg['GroupId'],
+            "GroupName": sg['GroupName'],
+            "Description": sg['Description'],
+            "VpcId": sg.get('VpcId'),
+            "Tags": sg.get('Tags', [])
+        }
+        for sg in all_sgs
+        if sg['GroupId'] not in attached_sgs
+        and sg['GroupId'] not in protected_sgs
+        and sg['GroupName'] != 'default'
+    ]
+
+    # If any unused SGs detected, send notification and log to S3
+    if unused_sgs:
+        # Serialize each group once; the SNS messages and the S3 array reuse the same bytes
+        encoded = [orjson.dumps(sg) for sg in unused_sgs]
+
+        # Publish to SNS: one message per security group, up to 10 per PublishBatch call
+        publish_batch(sns, SNS_TOPIC, (
+            {
+                "Subject": "SOC2 CC6.7 - Unused Security Group",
+                "Message": body.decode(),
+                # Keyed by group: a redelivered run may see a different set, so positions would collide
+                **dedup_attributes(f"{dedup}-{sg['GroupId']}", SNS_TOPIC)
+            }
+            for sg, body in zip(unused_sgs, encoded)
+        ))
+
+        # Write report to S3 inside audit_reports/cc6.7-sgs/ folder
+        filename = f"audit_reports/cc6.7-sgs/report-{stamp}-{dedup}.json"
+        s3.put_object(
+            Bucket=AUDIT_BUCKET,
+            Key=filename,
+            Body=gzip.compress(b"[" + b",".join(encoded) + b"]", compresslevel=1),
+            ContentEncoding='gzip',
+            ContentType='application/json'
+        )
+
+    return {"unused_count": len(unused_sgs)}
@@ -0,0 +1,97 @@
+# cc9-findings-drain.py
+"""
+SOC2 CC9.2 Findings Drain Lambda
+Handler: cc9-findings-drain.lambda_handler
+
+Drains the findings the CC9.2 at-rest / in-transit detectors buffer in SQS and
+writes them to S3 as one NDJSON object per finding type per run, instead of one
+object per finding. Schedule it via EventBridge (e.g. every 15 minutes); give the
+queue a visibility timeout longer than the Lambda timeout so messages in flight
+are not redelivered to the next run. Package soc2_aws.py alongside.
+
+Environment variables:
+- FINDINGS_QUEUE_URL (optional): SQS queue the detectors write to (default soc2-findings-buffer)
+- BUCKET (optional): central audit bucket (default soc2-audit-logs-central-206299126127)
+- MAX_MESSAGES (optional): upper bound on messages drained per run (default 10000)
+"""
+
+import os
+import gzip
+import orjson
+import boto3
+import datetime
+import logging
+from collections import defaultdict
+from soc2_aws import client_config
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CLIENT_CONFIG = client_config()
+
+sqs = boto3.client("sqs", config=CLIENT_CONFIG)
+s3 = boto3.client("s3", config=CLIENT_CONFIG)
+
+FINDINGS_QUEUE_URL = os.environ.get(
+    "FINDINGS_QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/206299126127/soc2-findings-buffer"
+)
+BUCKET = os.environ.get("BUCKET", "soc2-audit-logs-central-206299126127")
+MAX_MESSAGES = int(os.environ.get("MAX_MESSAGES", "10000"))
+
+# Same folders the detectors used to write individual findings to
+PREFIX_BY_TYPE = {
+    "encryption-at-rest": "audit_reports/cc9.2_at_rest/",
+    "encryption-in-transit": "audit_reports/cc9.2_in_transit/",
+}
+DEFAULT_PREFIX = "audit_reports/cc9.2_other/"
+
+def lambda_handler(event, context):
+    # prefix -> (NDJSON lines, receipt handles)
+    lines = defaultdict(list)
+    receipts = defaultdict(list)
+    received = 0
+
+    while received < MAX_MESSAGES:
+        resp = sqs.receive_message(QueueUrl=FINDINGS_QUEUE_URL, MaxNumberOfMessages=10, WaitTimeSeconds=1)
+        messages = resp.get("Messages", [])
+        if not messages:
+            break
+        for m in messages:
+            try:
+                finding = orjson.loads(m["Body"])
+            except ValueError:
+                # Left on the queue; its redrive policy moves it to the DLQ after repeated failures
+                logger.warning("Skipping malformed message %s", m.get("MessageId"))
+                continue
+            prefix = PREFIX_BY_TYPE.get(finding.get("type"), DEFAULT_PREFIX)
+            lines[prefix].append(orjson.dumps(finding))
+            receipts[prefix].append(m["ReceiptHandle"])
+        received += len(messages)
+
+    ts = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ")
+    written = []
+    for prefix, batch in lines.items():
+        key = f"{prefix}findings-{ts}.ndjson"
+        s3.put_object(
+            Bucket=BUCKET,
+            Key=key,
+            Body=gzip.compress(b"\n".join(batch) + b"\n", compresslevel=1),
+            ContentEncoding="gzip",
+            ContentType="application/x-ndjson"
+        )
+        logger.info("Wrote s3://%s/%s (count=%d)", BUCKET, key, len(batch))
+        written.append({"key": key, "count": len(batch)})
+
+        # Only delete once the object is stored; a failed PUT leaves the messages for the next run
+        handles = receipts[prefix]
+        for start in range(0, len(handles), 10):
+            resp = sqs.delete_message_batch(
+                QueueUrl=FINDINGS_QUEUE_URL,
+                Entries=[{"Id": str(i), "ReceiptHandle": h} for i, h in enumerate(handles[start:start + 10])]
+            )
+            # Undeleted messages are redelivered and written again by a later run
+            for failed in resp.get("Failed", []):
+                logger.error("SQS delete_message_batch entry %s failed for %s: %s",
+                             failed.get("Id"), key, failed.get("Message"))
+
+    return {"status": "OK", "received": received, "objects": written}
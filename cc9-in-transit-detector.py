@@ -1,34 +1,80 @@
-import boto3, json, datetime, os
-
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
-
-BUCKET = "soc2-audit-logs-central-206299126127"
-SNS_TOPIC = "arn:aws:sns:us-east-1:206299126127:SOC2Automation"
-
-def lambda_handler(event, context):
-    findings = []
-    findings.append({
-        "control": "CC9.2",
-        "type": "encryption-in-transit",
-        "resource": "elb://example-elb-http",
-        "status": "NON_COMPLIANT",
-        "timestamp": datetime.datetime.utcnow().isoformat()
-    })
-
-    # Save to S3
-    key = f"audit_reports/cc9.2_in_transit/finding-{datetime.datetime.utcnow().isoformat()}.json"
-    s3.put_object(
-        Bucket=BUCKET,
-        Key=key,
-        Body=json.dumps(findings, indent=2).encode("utf-8")
-    )
-
-    # Send SNS
-    sns.publish(
-        TopicArn=SNS_TOPIC,
-        Subject="CC9.2 In Transit Finding",
-        Message=json.dumps(findings, indent=2)
-    )
-
-    return {"status": "done", "findings": findings}
+import boto3, orjson, datetime, os, hashlib
+from soc2_aws import client_config, dedup_attributes, dedup_id, idempotent
+from botocore.exceptions import ClientError
+
+CLIENT_CONFIG = client_config()
+
+sqs = boto3.client('sqs', config=CLIENT_CONFIG)
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+
+SNS_TOPIC = "arn:aws:sns:us-east-1:206299126127:SOC2Automation"
+# Findings are buffered here; cc9-findings-drain.py writes them to S3 as one NDJSON object per run
+FINDINGS_QUEUE_URL = os.environ.get(
+    "FINDINGS_QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/206299126127/soc2-findings-buffer"
+)
+# Hash of the last findings set sent; a run whose findings match it sends nothing
+BUCKET = os.environ.get("BUCKET", "soc2-audit-logs-central-206299126127")
+HASH_KEY = "audit_reports/cc9.2_in_transit/latest-hash.txt"
+
+# Static part of the finding; only the timestamp changes per invocation
+FINDING_TEMPLATE = {
+    "control": "CC9.2",
+    "type": "encryption-in-transit",
+    "resource": "elb://example-elb-http",
+    "status": "NON_COMPLIANT",
+}
+
+def findings_hash(findings):
+    # The timestamp changes every run, so it is left out of the comparison
+    stable = [{k: v for k, v in f.items() if k != "timestamp"} for f in findings]
+    return hashlib.sha256(orjson.dumps(stable, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def last_hash():
+    try:
+        return s3.head_object(Bucket=BUCKET, Key=HASH_KEY).get("Metadata", {}).get("sha256")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+def lambda_handler(event, context):
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    findings = [{**FINDING_TEMPLATE, "timestamp": now}]
+
+    h = findings_hash(findings)
+    if h == last_hash():
+        return {"status": "unchanged", "findings": findings}
+
+    # Serialize each finding once; the SQS bodies and the SNS array reuse the same text
+    encoded = [orjson.dumps(f).decode() for f in findings]
+
+    # Buffer in SQS instead of one S3 PUT per finding; SendMessageBatch reports rejected entries instead of raising
+    failed = []
+    for start in range(0, len(encoded), 10):
+        resp = sqs.send_message_batch(
+            QueueUrl=FINDINGS_QUEUE_URL,
+            Entries=[{"Id": str(start + i), "MessageBody": body} for i, body in enumerate(encoded[start:start + 10])]
+        )
+        failed.extend(resp.get("Failed", []))
+    if failed:
+        # Fail before the hash is stored, so the next run sees the findings as changed and resends them
+        raise RuntimeError(
+            "SQS rejected findings: " + ", ".join(f"{f.get('Id')} ({f.get('Code')}: {f.get('Message')})" for f in failed)
+        )
+
+    # Send SNS
+    sns.publish(
+        TopicArn=SNS_TOPIC,
+        Subject="CC9.2 In Transit Finding",
+        Message="[" + ",".join(encoded) + "]",
+        **dedup_attributes(dedup_id(event), SNS_TOPIC)
+    )
+
+    # Record the hash only after every entry is accepted and SNS succeeds, so a failed run is retried in full
+    s3.put_object(Bucket=BUCKET, Key=HASH_KEY, Body=h.encode(), Metadata={"sha256": h}, ContentType="text/plain")
+
+    return {"status": "done", "findings": findings}
+
+# Powertools idempotency when IDEMPOTENCY_TABLE is set; unchanged otherwise
+lambda_handler = idempotent(lambda_handler)
@@ -1,71 +1,90 @@
-import boto3
-import json
-import gzip
-import os
-from datetime import datetime
-from urllib.parse import unquote_plus
-
-# Initialize AWS clients
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
-
-# Get environment variables
-SNS_TOPIC = os.environ['SNS_TOPIC']
-AUDIT_BUCKET = os.environ['AUDIT_BUCKET']
-
-def lambda_handler(event, context):
-    for record in event['Records']:
-        bucket = record['s3']['bucket']['name']
-        key = unquote_plus(record['s3']['object']['key'])
-
-        # Process only CloudTrail .json.gz files
-        if not key.endswith(".json.gz"):
-            continue
-
-        # Download and decompress CloudTrail file
-        response = s3.get_object(Bucket=bucket, Key=key)
-        gzipped = gzip.decompress(response['Body'].read())
-        data = json.loads(gzipped)
-
-        matched_events = []
-        for event_record in data.get('Records', []):
-            if event_record['eventName'] in [
-                "AuthorizeSecurityGroupIngress",
-                "RevokeSecurityGroupIngress",
-                "AuthorizeSecurityGroupEgress",
-                "RevokeSecurityGroupEgress",
-            ]:
-                matched_events.append(event_record)
-
-        if matched_events:
-            # Prepare SNS message
-            message = (
-                f"⚠️ Security Group Change(s) Detected:\n" +
-                "\n".join(
-                    f"{e['eventName']} by {e['userIdentity'].get('arn', 'Unknown User')}"
-                    for e in matched_events
-                )
-            )
-
-            # Send alert to SNS topic
-            sns.publish(
-                TopicArn=SNS_TOPIC,
-                Subject="SOC2 CC6.6 - Security Group Change",
-                Message=message
-            )
-
-            # Prepare audit file path inside audit_reports folder
-            audit_file = (
-                f"audit_reports/cc6.6-sg-changes/"
-                f"sg-change-{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%SZ')}.json"
-            )
-
-            # Save matched events to the audit S3 bucket
-            s3.put_object(
-                Bucket=AUDIT_BUCKET,
-                Key=audit_file,
-                Body=json.dumps(matched_events, indent=2),
-                ContentType='application/json'
-            )
-
-    return {"status": "processed"}
+import boto3
+import orjson
+import gzip
+import os
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+from soc2_aws import client_config, dedup_attributes, dedup_id
+
+CLIENT_CONFIG = client_config()
+
+# Initialize AWS clients
+s3 = boto3.client('s3', config=CLIENT_CONFIG)
+sns = boto3.client('sns', config=CLIENT_CONFIG)
+
+# Get environment variables
+SNS_TOPIC = os.environ['SNS_TOPIC']
+AUDIT_BUCKET = os.environ['AUDIT_BUCKET']
+AUDIT_PREFIX = "audit_reports/cc6.6-sg-changes/sg-change-"
+
+# Security group mutations reported under CC6.6
+SG_EVENTS = frozenset({
+    "AuthorizeSecurityGroupIngress",
+    "RevokeSecurityGroupIngress",
+    "AuthorizeSecurityGroupEgress",
+    "RevokeSecurityGroupEgress",
+})
+SG_EVENT_BYTES = tuple(name.encode() for name in SG_EVENTS)
+
+def lambda_handler(event, context):
+    ts = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%SZ')
+    # Matches from every file in this notification, alerted and stored once
+    all_matched = []
+
+    for record in event['Records']:
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+
+        # Process only CloudTrail .json.gz files
+        if not key.endswith(".json.gz"):
+            continue
+
+        # Decompress straight off the response stream so the gzipped blob is never held in memory
+        response = s3.get_object(Bucket=bucket, Key=key)
+        with gzip.GzipFile(fileobj=response['Body']) as gz:
+            raw = gz.read()
+
+        # Most trail files carry no SG events; a substring scan is far cheaper than parsing
+        if not any(name in raw for name in SG_EVENT_BYTES):
+            continue
+
+        data = orjson.loads(raw)
+        del raw
+
+        all_matched.extend(
+            event_record for event_record in data.get('Records', [])
+            if event_record.get('eventName') in SG_EVENTS
+        )
+
+    if all_matched:
+        dedup = dedup_id(event)
+        # Key from the notification's own time and id, so a redelivered notification overwrites the same object
+        stamp = event['Records'][0].get('eventTime', '')[:19].replace(':', '-')
+        stamp = stamp + 'Z' if stamp else ts
+
+        # Prepare SNS message
+        message = "⚠️ Security Group Change(s) Detected:\n" + "\n".join(
+            f"{e['eventName']} by {e['userIdentity'].get('arn', 'Unknown User')}"
+            for e in all_matched
+        )
+
+        # Send alert to SNS topic
+        sns.publish(
+            TopicArn=SNS_TOPIC,
+            Subject="SOC2 CC6.6 - Security Group Change",
+            Message=message,
+            **dedup_attributes(dedup, SNS_TOPIC)
+        )
+
+        audit_file = f"{AUDIT_PREFIX}{stamp}-{dedup}.json"
+
+        # Save matched events to the audit S3 bucket
+        s3.put_object(
+            Bucket=AUDIT_BUCKET,
+            Key=audit_file,
+            Body=gzip.compress(orjson.dumps(all_matched), compresslevel=1),
+            ContentEncoding='gzip',
+            ContentType='application/json'
+        )
+
+    return {"status": "processed", "matched": len(all_matched)}
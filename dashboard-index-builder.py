@@ -0,0 +1,127 @@
+# dashboard-index-builder.py
+"""
+SOC2 Dashboard Index Builder Lambda
+Handler: dashboard-index-builder.lambda_handler
+
+Maintains a Parquet index with one classified row per audit event, so the
+dashboard loads a single object instead of downloading and parsing every JSON
+finding. Trigger it with s3:ObjectCreated:* on the audit prefix: each new log
+is classified and merged into the existing index. An invocation without S3
+records (schedule / manual run), or a missing index, rebuilds it from scratch.
+Merges write the index conditionally on the ETag they read and re-merge on a
+conflict, so concurrent invocations cannot drop each other's rows; reserved
+concurrency 1 still avoids the wasted retries.
+
+Requires pandas + pyarrow (e.g. the AWS SDK for pandas Lambda layer), with soc2_audit_logs.py
+and soc2_aws.py packaged alongside.
+
+Environment variables:
+- BUCKET (required): central audit bucket
+- AUDIT_PREFIX (optional): prefix the controls write under (default "audit_reports/")
+- INDEX_KEY (optional): index object key (default "audit_reports/_index/dashboard.parquet")
+"""
+
+import io
+import os
+import boto3
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+from soc2_aws import client_config
+from botocore.exceptions import ClientError
+from soc2_audit_logs import classify, decode_log, is_audit_log
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Concurrent get_object calls per rebuild/merge; the S3 client pool is sized to match
+READ_WORKERS = 16
+
+s3 = boto3.client("s3", config=client_config(max_pool_connections=READ_WORKERS))
+
+BUCKET = os.environ["BUCKET"]
+AUDIT_PREFIX = os.environ.get("AUDIT_PREFIX", "audit_reports/")
+INDEX_KEY = os.environ.get("INDEX_KEY", "audit_reports/_index/dashboard.parquet")
+# Conditional-write conflicts tolerated per merge before giving up (the event is then retried by Lambda)
+MERGE_ATTEMPTS = 5
+
+def _read_log(key: str):
+    return decode_log(key, s3.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+
+def _list_audit_logs():
+    paginator = s3.get_paginator("list_objects_v2")
+    return [
+        obj["Key"]
+        for page in paginator.paginate(Bucket=BUCKET, Prefix=AUDIT_PREFIX)
+        for obj in page.get("Contents", [])
+        if is_audit_log(obj["Key"], AUDIT_PREFIX)
+    ]
+
+def _load_index():
+    """(index frame, ETag) of the current index, or None if there is none yet."""
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=INDEX_KEY)
+    except s3.exceptions.NoSuchKey:
+        return None
+    return pd.read_parquet(io.BytesIO(obj["Body"].read())), obj["ETag"]
+
+def _classify_keys(keys):
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        logs = list(pool.map(_read_log, keys))
+    return classify(list(zip(keys, logs)))
+
+def _write_index(rows, **conditions):
+    # Log timestamps are free-form (ISO strings, epoch numbers, keys); store them uniformly
+    rows["timestamp"] = rows["timestamp"].astype(str)
+    buf = io.BytesIO()
+    rows.to_parquet(buf, index=False)
+    s3.put_object(
+        Bucket=BUCKET,
+        Key=INDEX_KEY,
+        Body=buf.getvalue(),
+        ContentType="application/vnd.apache.parquet",
+        **conditions
+    )
+
+def _is_write_conflict(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict")
+
+def lambda_handler(event, context):
+    records = (event or {}).get("Records") or []
+    keys = [unquote_plus(r["s3"]["object"]["key"]) for r in records]
+    # Rollups (.jsonl) and the index itself (.parquet) never match, so our own write can't re-trigger us
+    keys = [k for k in keys if is_audit_log(k, AUDIT_PREFIX)]
+    if records and not keys:
+        return {"status": "IGNORED"}
+
+    if keys:
+        new_rows = _classify_keys(keys)
+        for attempt in range(1, MERGE_ATTEMPTS + 1):
+            loaded = _load_index()
+            if loaded is None:
+                break
+            index, etag = loaded
+            # Re-delivered events replace their previous rows instead of duplicating them
+            rows = pd.concat([index[~index["s3_key"].isin(keys)], new_rows], ignore_index=True)
+            try:
+                # Only replace the index we merged into; a concurrent merge in between makes this fail with 412
+                _write_index(rows, IfMatch=etag)
+            except ClientError as e:
+                if not _is_write_conflict(e):
+                    raise
+                logger.warning("Index changed while merging (attempt %d/%d); merging again", attempt, MERGE_ATTEMPTS)
+                continue
+            logger.info("Wrote index s3://%s/%s (rows=%d, merged=%d)", BUCKET, INDEX_KEY, len(rows), len(keys))
+            return {"status": "OK", "indexKey": INDEX_KEY, "rows": len(rows)}
+        else:
+            raise RuntimeError(f"Index s3://{BUCKET}/{INDEX_KEY} kept changing; gave up after {MERGE_ATTEMPTS} merges")
+
+    # Schedule / manual run, or no index yet: rebuild from every audit log
+    logger.info("Rebuilding dashboard index from s3://%s/%s", BUCKET, AUDIT_PREFIX)
+    keys = _list_audit_logs()
+    rows = _classify_keys(keys)
+    _write_index(rows)
+    logger.info("Wrote index s3://%s/%s (rows=%d, merged=%d)", BUCKET, INDEX_KEY, len(rows), len(keys))
+
+    return {"status": "OK", "indexKey": INDEX_KEY, "rows": len(rows)}
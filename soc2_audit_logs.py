@@ -0,0 +1,109 @@
+# soc2_audit_logs.py
+"""
+Shared audit-log decoding and classification
+
+Used by the dashboard, the index builder Lambda and the rollup Lambda, so a log
+is read and classified the same way whether the dashboard serves it from the
+Parquet index, a daily rollup or the raw object. Package this file alongside
+each of those handlers.
+
+classify() needs pandas + numpy; they are imported there so the rollup Lambda
+can use decode_log() without the pandas layer.
+"""
+
+import gzip
+import orjson
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Object suffixes the controls write; rollups (.jsonl) and the index (.parquet) are excluded
+AUDIT_LOG_SUFFIXES = (".json", ".ndjson", ".ndjson.gz")
+
+STATUS_BY_COMPLIANCE = {
+    "COMPLIANT": "remediation",
+    "NON_COMPLIANT_REMEDIATED": "remediation",
+    "NON_COMPLIANT": "deviation",
+}
+REMEDIATED_ACTIONS = ("REVOKED", "REMEDIATED")
+LOG_COLUMNS = ["control", "control_full", "sub_control_type", "status", "s3_key", "timestamp"]
+
+def is_audit_log(key: str, audit_prefix: str) -> bool:
+    """True for individual audit logs under audit_prefix; never for rollups or the index."""
+    return key.startswith(audit_prefix) and key.endswith(AUDIT_LOG_SUFFIXES)
+
+def inflate(raw: bytes) -> bytes:
+    # Writers may gzip bodies (ContentEncoding=gzip); boto3 does not inflate them for us.
+    # decode_log() inflates itself; only call this for bodies read some other way
+    return gzip.decompress(raw) if raw[:2] == GZIP_MAGIC else raw
+
+def read_jsonl(raw: bytes):
+    """Yield one decoded document per non-empty line."""
+    for line in raw.splitlines():
+        if line.strip():
+            yield orjson.loads(line)
+
+def decode_log(key: str, raw: bytes):
+    """Decode one audit object body; unparseable JSON comes back as {"raw": text}."""
+    raw = inflate(raw)
+    try:
+        if key.endswith(".ndjson"):
+            # Drained CC9.2 batches: one finding per line, same shape as a JSON array of findings
+            return list(read_jsonl(raw))
+        if key.endswith(".ndjson.gz"):
+            # CC7.2 detector NDJSON: header line, then one finding per line; rebuild the single document.
+            # An empty body is a run without a header or findings
+            header, *findings = list(read_jsonl(raw)) or [{}]
+            return {**header, "findings": findings}
+        return orjson.loads(raw)
+    except (orjson.JSONDecodeError, TypeError):
+        # Truncated or malformed bodies (TypeError: a header line that is not an object)
+        return {"raw": raw.decode("utf-8", "replace")}
+
+def classify(records):
+    """Turn (s3_key, log) records into dashboard rows using column-wise pandas ops."""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(records, columns=["s3_key", "log"])
+    if df.empty:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+
+    key_lower = df["s3_key"].str.lower()
+    df["control_full"] = df["s3_key"].str.split("/", n=2).str[1].fillna("unknown")
+    df["control"] = df["control_full"].str.split().str[0].fillna(df["control_full"])
+
+    full_lower = df["control_full"].str.lower()
+    is_cc67 = full_lower.str.contains("cc6.7", regex=False) | full_lower.str.contains("cc6-7", regex=False)
+    df["sub_control_type"] = np.select(
+        [
+            is_cc67 & (key_lower.str.contains("ebs-deleted", regex=False) | full_lower.str.contains("deleted", regex=False)),
+            is_cc67 & (key_lower.str.contains("ebs-unattached", regex=False) | full_lower.str.contains("unattached", regex=False)),
+        ],
+        ["ebs-deleted", "ebs-unattached"],
+        default=None,
+    )
+
+    # Dict logs are classified by compliance_status; anything else (e.g. JSON arrays) by its key
+    is_dict = df["log"].map(lambda d: isinstance(d, dict))
+    status = df["log"].map(
+        lambda d: d.get("compliance_status", "").upper() if isinstance(d, dict) else ""
+    ).map(STATUS_BY_COMPLIANCE)
+    by_key = np.where(
+        key_lower.str.contains("remediation", regex=False) & ~key_lower.str.contains("deviation", regex=False),
+        "remediation", "deviation",
+    )
+    df["status"] = status.where(status.notna(), np.where(is_dict, "deviation", by_key))
+    df["timestamp"] = df["log"].map(lambda d: d.get("timestamp") if isinstance(d, dict) else None).fillna(df["s3_key"])
+
+    # Remediation reports without a compliance_status expand to one row per revoked/remediated result
+    expand = is_dict & status.isna() & df["log"].map(lambda d: isinstance(d, dict) and "results" in d)
+    results = df[expand].assign(log=df.loc[expand, "log"].map(lambda d: d["results"])).explode("log")
+    results = results[results["log"].map(
+        lambda r: isinstance(r, dict) and r.get("action", "").upper() in REMEDIATED_ACTIONS
+    ).astype(bool)]
+    results = results.assign(
+        status="remediation",
+        timestamp=results["log"].map(lambda r: r.get("timestamp")).fillna(results["s3_key"]),
+    )
+
+    out = pd.concat([df[~expand], results]).sort_index(kind="stable").reset_index(drop=True)
+    return out[LOG_COLUMNS]
@@ -0,0 +1,75 @@
+# soc2_aws.py
+"""
+Shared boto3 client settings and SNS helpers for the SOC2 Lambdas
+
+Every control builds its clients from client_config() so retry, keepalive and
+user-agent settings stay the same everywhere, and sends per-finding alerts
+through publish_batch() so failed entries are logged the same way. Event-driven
+producers derive their SNS dedup ids from dedup_id() so a redelivered event
+maps to the same id in every control, and can opt into Powertools idempotency
+through idempotent(). Package this file alongside each handler that imports it.
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import orjson
+from botocore.config import Config
+try:
+    from itertools import batched
+except ImportError:  # Python < 3.12
+    def batched(iterable, n):
+        it = iter(iterable)
+        while chunk := tuple(itertools.islice(it, n)):
+            yield chunk
+
+logger = logging.getLogger(__name__)
+
+def client_config(max_pool_connections: int = 10) -> Config:
+    """Adaptive retries + TCP keepalive; raise max_pool_connections only for clients shared across threads."""
+    return Config(
+        retries={"mode": "adaptive", "max_attempts": 10},
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        user_agent_extra="soc2-automation/1.0",
+    )
+
+def publish_batch(sns, topic_arn: str, entries) -> None:
+    """Publish SNS entries (without Id) up to 10 per PublishBatch call; failed entries are logged, not raised."""
+    for chunk in batched(enumerate(entries), 10):
+        resp = sns.publish_batch(
+            TopicArn=topic_arn,
+            PublishBatchRequestEntries=[{"Id": str(i), **entry} for i, entry in chunk]
+        )
+        for failed in resp.get("Failed", []):
+            logger.error("SNS publish_batch entry %s failed: %s", failed.get("Id"), failed.get("Message"))
+
+def dedup_id(event) -> str:
+    """Deterministic id for an inbound event; at-least-once redeliveries map to the same id."""
+    return hashlib.blake2b(orjson.dumps(event, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+def dedup_attributes(dedup: str, topic_arn: str) -> dict:
+    """SNS publish kwargs carrying the dedup id for topic_arn."""
+    # Standard topics pass the id on for subscribers to dedup; FIFO topics drop the duplicate themselves
+    attrs = {"MessageAttributes": {"DedupId": {"DataType": "String", "StringValue": dedup}}}
+    if topic_arn.endswith(".fifo"):
+        attrs.update(MessageDeduplicationId=dedup, MessageGroupId="soc2")
+    return attrs
+
+def idempotent(handler):
+    """Wrap handler with Powertools idempotency when IDEMPOTENCY_TABLE is set; otherwise return it unchanged."""
+    # With IDEMPOTENCY_TABLE set (e.g. soc2-idem) and the Powertools layer attached, a redelivered event
+    # returns the stored result from DynamoDB instead of re-running
+    table = os.environ.get("IDEMPOTENCY_TABLE")
+    if not table:
+        return handler
+
+    from aws_lambda_powertools.utilities.idempotency import (
+        DynamoDBPersistenceLayer, IdempotencyConfig, idempotent as powertools_idempotent,
+    )
+
+    return powertools_idempotent(
+        persistence_store=DynamoDBPersistenceLayer(table_name=table),
+        config=IdempotencyConfig(expires_after_seconds=int(os.environ.get("IDEMPOTENCY_TTL", "3600"))),
+    )(handler)